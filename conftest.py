@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_inline(settings):
+    # Тесты подменяют MEDIA_ROOT временным каталогом и удаляют его сразу
+    # после теста: фоновый воркер миниатюр писал бы в удалённый каталог.
+    settings.THUMBNAIL_ASYNC = False
@@ -0,0 +1,166 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+ACCESS_RESOLUTION = 1.0
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в локальном файле SQLite, общий для всех процессов хоста.
+
+    Файл открывается в режиме WAL, поэтому читатели не блокируют писателя.
+    При превышении MAX_ENTRIES вытесняются записи, к которым дольше всего
+    не обращались (LRU). incr выполняется в одной транзакции и атомарен
+    между процессами.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _read(self, connection, key, now):
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return None
+        if now - accessed > ACCESS_RESOLUTION:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return row
+
+    def _cull(self, connection):
+        total = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),),
+        )
+        total = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total > self._max_entries:
+            excess = max(total // self._cull_frequency, 1)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (excess,),
+            )
+
+    def _write(self, key, value, timeout, only_new):
+        now = time.time()
+        blob = pickle.dumps(value, self.pickle_protocol)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if only_new and self._read(connection, key, now) is not None:
+                return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed)'
+                ' VALUES (?, ?, ?, ?)',
+                (key, blob, self.get_backend_timeout(timeout), now),
+            )
+            self._cull(connection)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            row = self._read(connection, key, time.time())
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(self._key(key, version), value, timeout, only_new=False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(
+            self._key(key, version), value, timeout, only_new=True
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            updated = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ?'
+                ' AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now),
+            ).rowcount
+        return bool(updated)
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            return self._read(connection, key, time.time()) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = self._read(connection, key, time.time())
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, self.pickle_protocol), key),
+            )
+        return value
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время жизни потока воркера.
+        pass
@@ -0,0 +1,91 @@
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import cache as default_cache
+
+LOCK_TIMEOUT = 30
+BETA = 1.0
+
+_local = threading.local()
+
+
+def served_stale():
+    """Отдал ли get_or_compute устаревшее значение внутри текущего compute."""
+    return getattr(_local, 'stale', False)
+
+
+def _is_fresh(entry, version, beta):
+    """Вероятностное досрочное истечение (XFetch).
+
+    Чем дольше пересчитывалось значение и чем ближе срок истечения,
+    тем вероятнее, что один из запросов пересчитает его заранее.
+    """
+    _, entry_version, expires, delta = entry
+    if entry_version != version:
+        return False
+    if expires is None:
+        return True
+    jitter = -delta * beta * math.log(1.0 - random.random())
+    return time.time() + jitter < expires
+
+
+def get_or_compute(key, compute, timeout, version=None, beta=BETA,
+                   cache=None):
+    """Значение из кэша с защитой от одновременного пересчёта.
+
+    Пересчитывает только запрос, взявший блокировку; остальные в это
+    время получают устаревшее значение. Запись хранится вдвое дольше
+    timeout, чтобы было что отдать, пока идёт пересчёт. Значение,
+    собранное из устаревших вложенных значений, не сохраняется: иначе
+    оно жило бы под новой версией.
+    """
+    cache = cache or default_cache
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, version, beta):
+        return entry[0]
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, True, LOCK_TIMEOUT)
+    if not locked and entry is not None:
+        _local.stale = True
+        return entry[0]
+    outer_stale = served_stale()
+    _local.stale = False
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        if not served_stale():
+            expires = None if timeout is None else finished + timeout
+            cache.set(
+                key,
+                (value, version, expires, finished - started),
+                None if timeout is None else timeout * 2,
+            )
+    finally:
+        _local.stale = outer_stale or served_stale()
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+def stampede_cached(key, timeout, version=None, beta=BETA):
+    """Декоратор над get_or_compute.
+
+    key строит ключ кэша по аргументам функции, timeout и version
+    могут быть функциями без аргументов и вычисляются при каждом вызове.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(
+                key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                timeout() if callable(timeout) else timeout,
+                version=version() if callable(version) else version,
+                beta=beta,
+            )
+        return wrapper
+    return decorator
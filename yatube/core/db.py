@@ -0,0 +1,78 @@
+import random
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LOCK_BACKOFF = 0.02
+
+
+def apply_pragmas(cursor):
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение SQLite прагмами из настроек."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor)
+
+
+def is_locked(error):
+    return 'locked' in str(error)
+
+
+def backoff(retries=None):
+    """Паузы между попытками: экспоненциальный рост со случайным разбросом.
+
+    Разброс не даёт писателям, столкнувшимся на блокировке, повторить
+    попытку одновременно и столкнуться снова.
+    """
+    if retries is None:
+        retries = settings.SQLITE_LOCK_RETRIES
+    for attempt in range(retries):
+        yield LOCK_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def _write_aliases():
+    return [
+        alias for alias in connections
+        if alias not in settings.DATABASE_REPLICAS
+    ]
+
+
+def retry_on_lock(func):
+    """Выполняет func в транзакции и повторяет её при database is locked.
+
+    Транзакция открывается во всех базах, куда идёт запись (default
+    и шарды постов), чтобы повтор не оставил половину изменений.
+
+    busy_timeout не спасает транзакцию, которая начала с чтения: SQLite
+    сразу отказывает ей в записи, если базу успел изменить другой
+    писатель, и повторить можно только всю транзакцию. Внутри внешней
+    транзакции func выполняется один раз — повторять там нечего.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return func(*args, **kwargs)
+        delays = backoff()
+        while True:
+            try:
+                with ExitStack() as stack:
+                    for alias in _write_aliases():
+                        stack.enter_context(transaction.atomic(using=alias))
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                delay = next(delays, None)
+                if delay is None or not is_locked(error):
+                    raise
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,148 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas, backoff, is_locked
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, comments_count INTEGER)',
+    'CREATE TABLE comment ('
+    'id INTEGER PRIMARY KEY, post_id INTEGER, text TEXT)',
+    'CREATE INDEX comment_post ON comment (post_id, id)',
+)
+READ = (
+    'SELECT id, text FROM comment WHERE post_id = ? '
+    'ORDER BY id DESC LIMIT 10'
+)
+PROFILES = ('baseline', 'tuned')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite под параллельной нагрузкой '
+        'без настроек и с профилем SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Число параллельных воркеров',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Сколько запросов выполняет каждый воркер',
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля пишущих запросов',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=100,
+            help='Число постов, между которыми распределяются комментарии',
+        )
+
+    def connect(self, path, tuned):
+        connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        if tuned:
+            apply_pragmas(connection.cursor())
+        return connection
+
+    def prepare(self, path, posts):
+        connection = sqlite3.connect(path, isolation_level=None)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            'INSERT INTO post (id, comments_count) VALUES (?, 0)',
+            ((pk,) for pk in range(1, posts + 1)),
+        )
+        connection.close()
+
+    def write(self, connection, post_id, retry):
+        """Как add_comment: чтение и запись в одной транзакции."""
+        delays = backoff() if retry else iter(())
+        while True:
+            try:
+                connection.execute('BEGIN')
+                connection.execute(
+                    'SELECT comments_count FROM post WHERE id = ?', (post_id,)
+                ).fetchone()
+                connection.execute(
+                    'INSERT INTO comment (post_id, text) VALUES (?, ?)',
+                    (post_id, 'Комментарий'),
+                )
+                connection.execute(
+                    'UPDATE post SET comments_count = comments_count + 1 '
+                    'WHERE id = ?', (post_id,),
+                )
+                connection.execute('COMMIT')
+                return
+            except sqlite3.OperationalError as error:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                delay = next(delays, None)
+                if delay is None or not is_locked(error):
+                    raise
+                time.sleep(delay)
+
+    def work(self, path, tuned, options, seed):
+        generator = random.Random(seed)
+        persistent = self.connect(path, tuned) if tuned else None
+        done = errors = 0
+        for _ in range(options['requests']):
+            connection = persistent or self.connect(path, tuned)
+            post_id = generator.randint(1, options['posts'])
+            try:
+                if generator.random() < options['write_ratio']:
+                    self.write(connection, post_id, retry=tuned)
+                else:
+                    connection.execute(READ, (post_id,)).fetchall()
+                done += 1
+            except sqlite3.OperationalError as error:
+                if not is_locked(error):
+                    raise
+                errors += 1
+            finally:
+                if persistent is None:
+                    connection.close()
+        if persistent is not None:
+            persistent.close()
+        return done, errors
+
+    def run(self, path, tuned, options):
+        threads = options['threads']
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(
+                self.work,
+                [path] * threads,
+                [tuned] * threads,
+                [options] * threads,
+                range(threads),
+            ))
+        elapsed = time.monotonic() - started
+        done = sum(done for done, _ in results)
+        errors = sum(errors for _, errors in results)
+        return done / elapsed, errors
+
+    def handle(self, *args, **options):
+        rates = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in PROFILES:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                self.prepare(path, options['posts'])
+                rate, errors = self.run(path, profile == 'tuned', options)
+                rates[profile] = rate
+                self.stdout.write(
+                    f'{profile}: {rate:.0f} запросов/с, '
+                    f'ошибок блокировки: {errors}'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Прирост: x{rates["tuned"] / rates["baseline"]:.1f}'
+        ))
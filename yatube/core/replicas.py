@@ -0,0 +1,79 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def reading_replica():
+    """Читает ли текущий запрос с реплик."""
+    return bool(settings.DATABASE_REPLICAS) and getattr(
+        _state, 'replicas_allowed', False
+    )
+
+
+def use_primary():
+    """До конца HTTP-запроса чтение идёт из основной базы."""
+    _state.replicas_allowed = False
+
+
+class ReplicaRouter:
+    """Чтение — с реплик из DATABASE_REPLICAS, запись — в default.
+
+    Реплики используются только в запросах, которые разрешил
+    ReplicaMiddleware; команды, фоновые потоки и запрос после первой
+    записи читают основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        use_primary()
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Пускает безопасные запросы на реплики и закрепляет писавших.
+
+    Ответ на запрос, который писал в базу, ставит cookie: следующие
+    REPLICA_LAG секунд клиент читает основную базу и видит свои изменения,
+    даже если реплика ещё отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replicas_allowed = (
+            request.method in SAFE_METHODS
+            and PRIMARY_COOKIE not in request.COOKIES
+        )
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.replicas_allowed = False
+            _state.wrote = False
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=settings.REPLICA_LAG,
+                httponly=True,
+            )
+        return response
@@ -0,0 +1,81 @@
+from django import template
+from django.conf import settings
+from sorl.thumbnail.templatetags.thumbnail import ThumbnailNode
+
+from core.thumbnails import backend
+
+register = template.Library()
+
+DEFAULT_WIDTH = 960
+
+
+class ReadyThumbnailNode(ThumbnailNode):
+    """{% thumbnail %}, который только читает готовые миниатюры.
+
+    Пока фоновый воркер не создал миниатюру, выводится блок {% empty %}.
+    Если картинки у объекта нет, не выводится ничего.
+    """
+
+    def _render(self, context):
+        file_ = self.file_.resolve(context)
+        if not file_:
+            return ''
+        geometry = self.geometry.resolve(context)
+        options = {}
+        for key, expr in self.options:
+            noresolve = {'True': True, 'False': False, 'None': None}
+            value = noresolve.get(str(expr), expr.resolve(context))
+            if key == 'options':
+                options.update(value)
+            else:
+                options[key] = value
+        thumbnail = backend.get_ready_thumbnail(file_, geometry, **options)
+        if thumbnail is None:
+            return self.nodelist_empty.render(context)
+        if not self.as_var:
+            return thumbnail.url
+        context.push()
+        context[self.as_var] = thumbnail
+        output = self.nodelist_file.render(context)
+        context.pop()
+        return output
+
+
+@register.tag
+def thumbnail(parser, token):
+    return ReadyThumbnailNode(parser, token)
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, field='image'):
+    """Одним запросом загружает миниатюры картинок всех постов страницы."""
+    backend.prefetch(getattr(post, field) for post in posts)
+    return ''
+
+
+@register.inclusion_tag('includes/responsive_image.html')
+def responsive_thumbnail(image):
+    """Готовые миниатюры THUMBNAIL_PRESETS как srcset по форматам."""
+    variants = {}
+    if not image:
+        return {'image': image}
+    for geometry, options in settings.THUMBNAIL_PRESETS:
+        thumbnail = backend.get_ready_thumbnail(image, geometry, **options)
+        if thumbnail is not None:
+            variants.setdefault(options['format'], []).append(thumbnail)
+    jpeg = variants.get('JPEG', [])
+    fallback = min(
+        jpeg, key=lambda thumbnail: abs(thumbnail.width - DEFAULT_WIDTH),
+        default=None,
+    )
+    return {
+        'image': image,
+        'fallback': fallback,
+        'srcset': {
+            image_format: ', '.join(
+                f'{thumbnail.url} {thumbnail.width}w'
+                for thumbnail in thumbnails
+            )
+            for image_format, thumbnails in variants.items()
+        },
+    }
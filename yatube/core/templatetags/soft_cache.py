@@ -0,0 +1,74 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+
+from core.caching import get_or_compute
+
+register = template.Library()
+
+
+class SoftCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on,
+                 version):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        expire_time = self.expire_time.resolve(context)
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"softcache" tag got a non-integer timeout: '
+                    f'{expire_time!r}'
+                )
+        try:
+            fragment_cache = caches['template_fragments']
+        except InvalidCacheBackendError:
+            fragment_cache = caches['default']
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        version = self.version.resolve(context) if self.version else None
+        return get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+            version=version,
+            cache=fragment_cache,
+        )
+
+
+@register.tag('softcache')
+def do_softcache(parser, token):
+    """Аналог {% cache %} с защитой от одновременного пересчёта.
+
+    Использование::
+
+        {% load soft_cache %}
+        {% softcache [timeout] [fragment_name] [var1] ... [version=expr] %}
+            .. some expensive processing ..
+        {% endsoftcache %}
+
+    Пока один запрос пересобирает фрагмент, остальные получают прежнюю
+    версию. Смена version делает фрагмент устаревшим без смены ключа.
+    """
+    nodelist = parser.parse(('endsoftcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments."
+        )
+    version = None
+    if tokens[-1].startswith('version='):
+        version = parser.compile_filter(tokens.pop()[len('version='):])
+    return SoftCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        version,
+    )
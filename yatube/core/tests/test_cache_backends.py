@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+CACHE_PATH = os.path.join(TEMP_CACHE_DIR, 'cache.sqlite3')
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10,
+            'CULL_FREQUENCY': 2,
+        },
+    }
+}
+INCREMENTS = 50
+
+
+def increment_counter(times):
+    cache = caches['default']
+    for _ in range(times):
+        cache.incr('counter')
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SQLiteCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+
+    def test_basic_operations(self):
+        """set/get/add/delete работают как у встроенных бэкендов."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertTrue(self.cache.has_key('new'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_expiration(self):
+        """Просроченные записи не возвращаются."""
+        self.cache.set('short', 'value', 0.1)
+        self.cache.set('forever', 'value', None)
+        time.sleep(0.2)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_incr(self):
+        """incr увеличивает значение и падает на отсутствующем ключе."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        for number in range(10):
+            self.cache.set(f'key{number}', number)
+        connection = self.cache._connection()
+        connection.execute('UPDATE cache SET accessed = 0')
+        connection.execute(
+            "UPDATE cache SET accessed = 1 WHERE key LIKE '%key0'"
+        )
+        self.cache.set('key10', 10)
+        self.assertEqual(self.cache.get('key0'), 0)
+        self.assertEqual(self.cache.get('key10'), 10)
+        remaining = sum(
+            self.cache.has_key(f'key{number}') for number in range(11)
+        )
+        self.assertLessEqual(remaining, 10)
+
+    def test_shared_between_processes(self):
+        """Процессы видят один кэш, а incr атомарен между ними."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment_counter, args=(INCREMENTS,))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), INCREMENTS * 4)
+
+    def test_template_cache_tag(self):
+        """Бэкенд работает с тегом {% cache %}."""
+        template = Template(
+            '{% load cache %}{% cache 60 fragment %}{{ value }}{% endcache %}'
+        )
+        self.assertEqual(template.render(Context({'value': 'first'})), 'first')
+        self.assertEqual(
+            template.render(Context({'value': 'second'})), 'first'
+        )
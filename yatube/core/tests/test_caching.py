@@ -0,0 +1,111 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from core.caching import get_or_compute, stampede_cached
+
+
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_cached(self):
+        """Свежее значение не пересчитывается."""
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_locked(self):
+        """Пока пересчёт заблокирован, отдаётся устаревшее значение."""
+        get_or_compute('key', self.compute, 60, version=1)
+        cache.add('key:lock', True)
+        self.assertEqual(
+            get_or_compute('key', self.compute, 60, version=2), 1
+        )
+        self.assertEqual(self.calls, 1)
+        cache.delete('key:lock')
+        self.assertEqual(
+            get_or_compute('key', self.compute, 60, version=2), 2
+        )
+
+    def test_value_from_stale_nested_not_stored(self):
+        """Значение, собранное из устаревшего вложенного, не сохраняется."""
+        get_or_compute('inner', self.compute, 60, version=1)
+        cache.add('inner:lock', True)
+
+        def outer():
+            return get_or_compute('inner', self.compute, 60, version=2)
+
+        self.assertEqual(get_or_compute('outer', outer, 60), 1)
+        self.assertIsNone(cache.get('outer'))
+        cache.delete('inner:lock')
+        self.assertEqual(get_or_compute('outer', outer, 60), 2)
+        self.assertEqual(cache.get('outer')[0], 2)
+
+    def test_lock_released_after_failure(self):
+        """Ошибка пересчёта не оставляет блокировку."""
+        def fail():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            get_or_compute('key', fail, 60)
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_early_expiration(self):
+        """Близкое к истечению значение пересчитывается досрочно."""
+        cache.set('key', (0, None, time.time() + 1, 10.0))
+        with mock.patch('core.caching.random.random', return_value=0.5):
+            self.assertEqual(get_or_compute('key', self.compute, 60), 1)
+
+    def test_decorator(self):
+        """stampede_cached кэширует результат по ключу из аргументов."""
+        @stampede_cached(key=lambda number: f'square:{number}', timeout=60)
+        def square(number):
+            self.calls += 1
+            return number * number
+
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(4), 16)
+        self.assertEqual(self.calls, 2)
+
+
+class SoftCacheTagTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.template = Template(
+            '{% load soft_cache %}'
+            '{% softcache None fragment name version=version %}'
+            '{{ value }}'
+            '{% endsoftcache %}'
+        )
+
+    def render(self, **context):
+        return self.template.render(Context(context))
+
+    def test_fragment_cached_until_version_changes(self):
+        """Фрагмент пересобирается только при смене версии."""
+        self.assertEqual(
+            self.render(name='a', version=1, value='first'), 'first'
+        )
+        self.assertEqual(
+            self.render(name='a', version=1, value='second'), 'first'
+        )
+        self.assertEqual(
+            self.render(name='a', version=2, value='second'), 'second'
+        )
+
+    def test_fragment_varies_on_arguments(self):
+        """Аргументы после имени фрагмента входят в ключ."""
+        self.render(name='a', version=1, value='first')
+        self.assertEqual(
+            self.render(name='b', version=1, value='second'), 'second'
+        )
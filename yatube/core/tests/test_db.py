@@ -0,0 +1,67 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from ..db import retry_on_lock
+
+
+class PragmasTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Новое соединение получает прагмы из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+
+
+@mock.patch('core.db.time.sleep')
+class RetryOnLockTest(TransactionTestCase):
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        @retry_on_lock
+        def func():
+            calls.append(connection.in_atomic_block)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return 'ok'
+        return func, calls
+
+    def test_retries_until_success(self, sleep):
+        """Транзакция повторяется после database is locked."""
+        func, calls = self.flaky(failures=2)
+        self.assertEqual(func(), 'ok')
+        self.assertEqual(calls, [True, True, True])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_gives_up_after_retries(self, sleep):
+        """После SQLITE_LOCK_RETRIES повторов ошибка пробрасывается."""
+        func, calls = self.flaky(failures=100)
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(len(calls), settings.SQLITE_LOCK_RETRIES + 1)
+
+    def test_other_errors_not_retried(self, sleep):
+        """Прочие ошибки базы не повторяются."""
+        func, calls = self.flaky(failures=1, message='no such table')
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(len(calls), 1)
+
+
+class BenchmarkCommandTest(SimpleTestCase):
+    def test_benchmark_reports_both_profiles(self):
+        """benchmark_sqlite печатает скорость обоих профилей и прирост."""
+        out = StringIO()
+        call_command(
+            'benchmark_sqlite', threads=2, requests=20, posts=5, stdout=out
+        )
+        output = out.getvalue()
+        self.assertIn('baseline:', output)
+        self.assertIn('tuned:', output)
+        self.assertIn('Прирост: x', output)
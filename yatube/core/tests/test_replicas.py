@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import (
+    Client, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from posts.models import Follow, Post
+
+from ..replicas import PRIMARY_COOKIE, ReplicaRouter
+
+User = get_user_model()
+
+REPLICA = 'replica'
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    def test_without_replicas_everything_goes_to_default(self):
+        """Без реплик чтение и запись идут в default."""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_write(Post), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_migrations_skip_replicas(self):
+        """Миграции применяются только к основной базе."""
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate(REPLICA, 'posts'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Реплика — снимок тестовой базы в файле SQLite.
+
+    Всё, что создано после снимка, есть только в основной базе, поэтому
+    по содержимому страницы видно, из какой базы она прочитана.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.old_post = Post.objects.create(
+            author=self.author, text='Пост из снимка'
+        )
+        self.snapshot()
+        self.new_post = Post.objects.create(
+            author=self.author, text='Пост после снимка'
+        )
+
+    def snapshot(self):
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        connections.databases[REPLICA] = dict(
+            connections.databases[DEFAULT_DB_ALIAS], NAME=path
+        )
+        self.addCleanup(self.drop_replica)
+
+    def drop_replica(self):
+        connections[REPLICA].close()
+        delattr(connections._connections, REPLICA)
+        del connections.databases[REPLICA]
+
+    def test_get_reads_replica(self):
+        """GET-запрос без cookie читает реплику."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.old_post]
+        )
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_cached_page_read_from_primary(self):
+        """Вскоре после изменения страница для кэша читается из default."""
+        url = reverse('posts:index')
+        self.assertContains(Client().get(url), 'Пост после снимка')
+        with override_settings(REPLICA_LAG=0):
+            cache.clear()
+            self.assertNotContains(Client().get(url), 'Пост после снимка')
+
+    def test_post_create_pins_client(self):
+        """После публикации автор видит свой пост."""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'}
+        )
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        response = self.client.get(reverse('posts:profile', args=('reader',)))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Свежий пост'],
+        )
+
+    def test_add_comment_pins_client(self):
+        """После комментария автор видит его под постом."""
+        url = reverse('posts:post_detail', args=(self.old_post.pk,))
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.old_post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        response = self.client.get(url)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий'],
+        )
+
+    def test_profile_follow_pins_client(self):
+        """Подписка через GET тоже закрепляет клиента за основной базой."""
+        response = self.client.get(
+            reverse('posts:profile_follow', args=('author',))
+        )
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        response = self.client.get(reverse('posts:profile', args=('author',)))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.new_post, self.old_post],
+        )
@@ -0,0 +1,38 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage(location=TEMP_MEDIA_ROOT)
+
+    def test_name_is_sharded_content_hash(self):
+        """Имя файла — sha256 содержимого в подкаталогах ab/cd."""
+        name = self.storage.save('posts/Meme.JPG', ContentFile(b'meme'))
+        self.assertEqual(
+            name,
+            'posts/a2/8a/a28a9ca63e8460b03dff84b5645c6c2a'
+            '30f48149c0e5b273525cf4b80fe8a8ca.jpg',
+        )
+        self.assertTrue(self.storage.exists(name))
+
+    def test_identical_files_stored_once(self):
+        """Одинаковое содержимое сохраняется в один файл."""
+        first = self.storage.save('posts/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('posts/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
@@ -0,0 +1,235 @@
+import itertools
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail.models import KVStore
+
+from core import thumbnails
+from posts.models import ArchivedPost, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+WIDTHS = itertools.count(100)
+
+
+def make_image(name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (next(WIDTHS), 50), 'red').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+TEMPLATE = Template(
+    '{% load ready_thumbnails %}'
+    '{% thumbnail image "960x339" crop="center" upscale=True as im %}'
+    '{{ im.url }}'
+    '{% empty %}placeholder{% endthumbnail %}'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ReadyThumbnailTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.backend.ready.clear()
+        self.user = User.objects.create_user(username='author')
+
+    def render(self, image):
+        return TEMPLATE.render(Context({'image': image}))
+
+    def test_placeholder_until_generated(self):
+        """Пока миниатюры нет, выводится заглушка и Pillow не вызывается."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image()
+        )
+        with mock.patch.object(
+            thumbnails.backend, 'get_thumbnail'
+        ) as get_thumbnail:
+            self.assertEqual(self.render(post.image), 'placeholder')
+        get_thumbnail.assert_not_called()
+        thumbnails.generate(post.image.name)
+        self.assertIn('/media/cache/', self.render(post.image))
+
+    def test_no_image_renders_nothing(self):
+        """Без картинки не выводится ни миниатюра, ни заглушка."""
+        self.assertEqual(self.render(''), '')
+
+    def test_ready_thumbnail_touches_post(self):
+        """Готовая миниатюра обновляет отметку изменения поста."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image()
+        )
+        updated = post.updated
+        thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        self.assertGreater(post.updated, updated)
+
+    def test_prefetch_makes_rendering_free(self):
+        """После prefetch миниатюры страницы выводятся без запросов."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text='Текст', image=make_image()
+            )
+            for _ in range(3)
+        ]
+        for post in posts[:2]:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        thumbnails.backend.ready.clear()
+        with self.assertNumQueries(1):
+            thumbnails.backend.prefetch(post.image for post in posts)
+        with self.assertNumQueries(0):
+            rendered = [self.render(post.image) for post in posts]
+            thumbnails.backend.prefetch(post.image for post in posts[:2])
+        self.assertIn('/media/cache/', rendered[0])
+        self.assertEqual(rendered[2], 'placeholder')
+
+    def test_miss_not_cached(self):
+        """Миниатюра из другого процесса видна после промаха."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image()
+        )
+        thumbnails.generate(post.image.name)
+        rows = list(KVStore.objects.all())
+        KVStore.objects.all().delete()
+        cache.clear()
+        thumbnails.backend.ready.clear()
+        self.assertEqual(self.render(post.image), 'placeholder')
+        with override_settings(THUMBNAIL_MISS_TIMEOUT=0):
+            thumbnails.backend.prefetch([post.image])
+        KVStore.objects.bulk_create(rows)
+        self.assertIn('/media/cache/', self.render(post.image))
+
+    def test_responsive_srcset(self):
+        """Карточка выводит srcset всех ширин с ленивой загрузкой."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image()
+        )
+        template = Template(
+            '{% load ready_thumbnails %}{% responsive_thumbnail image %}'
+        )
+        self.assertIn(
+            'bg-light', template.render(Context({'image': post.image}))
+        )
+        thumbnails.generate(post.image.name)
+        html = template.render(Context({'image': post.image}))
+        for width in settings.THUMBNAIL_WIDTHS:
+            self.assertIn(f' {width}w', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('width="960" height="339"', html)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=True)
+class ThumbnailQueueTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.backend.ready.clear()
+        self.user = User.objects.create_user(username='author')
+
+    def test_upload_enqueues_after_commit(self):
+        """Загрузка картинки ставит задачу в очередь после коммита."""
+        with mock.patch('core.thumbnails.enqueue') as enqueue:
+            post = Post.objects.create(
+                author=self.user, text='Текст', image=make_image()
+            )
+            enqueue.assert_called_once_with(post.image.name)
+            post.text = 'Новый текст'
+            post.save()
+            enqueue.assert_called_once()
+
+    def test_worker_generates_thumbnails(self):
+        """Фоновый воркер создаёт миниатюры без участия запроса."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=make_image()
+        )
+        thumbnails.wait()
+        self.assertIn(
+            '/media/cache/',
+            TEMPLATE.render(Context({'image': post.image})),
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class BackfillThumbnailsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.backend.ready.clear()
+        user = User.objects.create_user(username='author')
+        with mock.patch('core.thumbnails.enqueue'):
+            self.posts = [
+                Post.objects.create(
+                    author=user, text='Текст', image=make_image()
+                )
+                for _ in range(3)
+            ]
+        Post.objects.create(author=user, text='Без картинки')
+
+    def backfill(self, **options):
+        out = StringIO()
+        call_command(
+            'backfill_thumbnails', workers=0, batch_size=2, stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_creates_missing_and_skips_existing(self):
+        """Создаются только отсутствующие миниатюры."""
+        thumbnails.generate(self.posts[0].image.name)
+        sizes = len(settings.THUMBNAIL_PRESETS)
+        self.assertIn(
+            f'3 картинок, {2 * sizes} миниатюр', self.backfill()
+        )
+        self.assertIn('3 картинок, 0 миниатюр', self.backfill())
+
+    def test_resume_from_checkpoint(self):
+        """С файлом контрольной точки обработка продолжается с места."""
+        checkpoint = Path(TEMP_MEDIA_ROOT) / 'checkpoint'
+        checkpoint.write_text(f'default {self.posts[1].pk}')
+        sizes = len(settings.THUMBNAIL_PRESETS)
+        self.assertIn(
+            f'1 картинок, {sizes} миниатюр',
+            self.backfill(checkpoint=checkpoint),
+        )
+        self.assertFalse(checkpoint.exists())
+
+    def test_archived_posts_included(self):
+        """Картинки архивных постов тоже получают миниатюры."""
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            pub_date=timezone.now() - timedelta(days=1000)
+        )
+        call_command('archive_posts', stdout=StringIO())
+        self.assertTrue(ArchivedPost.objects.filter(
+            image=self.posts[0].image.name
+        ).exists())
+        sizes = len(settings.THUMBNAIL_PRESETS)
+        self.assertIn(f'3 картинок, {3 * sizes} миниатюр', self.backfill())
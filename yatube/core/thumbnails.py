@@ -0,0 +1,229 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.dispatch import Signal
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+logger = logging.getLogger(__name__)
+
+thumbnails_ready = Signal(providing_args=['name'])
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш процесса с ограничением по числу записей."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ReadyKVStore(cached_db_kvstore.KVStore):
+    """Key-value store sorl, который не кэширует промахи.
+
+    sorl запоминает отсутствие миниатюры на THUMBNAIL_CACHE_TIMEOUT,
+    и процесс со своим кэшем не увидел бы миниатюру, созданную фоновым
+    воркером или backfill_thumbnails в другом процессе.
+    """
+
+    def _get_raw(self, key):
+        value = self.cache.get(key)
+        if value is None or value == EMPTY_VALUE:
+            value = KVStore.objects.filter(key=key).values_list(
+                'value', flat=True
+            ).first()
+            if value is None:
+                return None
+            self.cache.set(key, value, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        return value
+
+
+def source_file(file_):
+    """Исходник для sorl; имена ищутся в хранилище загрузок.
+
+    Без явного хранилища sorl открыл бы имя в THUMBNAIL_STORAGE, и ключи
+    миниатюр разошлись бы с ключами, посчитанными по Post.image.
+    """
+    if hasattr(file_, 'storage'):
+        return file_
+    return ImageFile(file_, default_storage)
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    def __init__(self):
+        super().__init__()
+        self.ready = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+        self.misses = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+
+    def _missing(self, key):
+        expires = self.misses.get(key)
+        return expires is not None and expires > time.monotonic()
+
+    def get_options(self, source, options):
+        """Опции миниатюры с теми же умолчаниями, что и в get_thumbnail."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_key(self, file_, geometry_string, options):
+        """Ключ миниатюры в key-value store; вычисляется без I/O."""
+        source = ImageFile(source_file(file_))
+        options = self.get_options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return add_prefix(ImageFile(name, default.storage).key)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из LRU-кэша, key-value store или None.
+
+        В отличие от get_thumbnail никогда не открывает исходник
+        и не запускает Pillow.
+        """
+        key = self.thumbnail_key(file_, geometry_string, options)
+        thumbnail = self.ready.get(key)
+        if thumbnail is None and not self._missing(key):
+            value = default.kvstore._get_raw(key)
+            if value is not None:
+                thumbnail = deserialize_image_file(value)
+                self.ready.set(key, thumbnail)
+        return thumbnail
+
+    def prefetch(self, files):
+        """Загружает миниатюры THUMBNAIL_PRESETS для всех файлов сразу.
+
+        Ключи, которых нет в LRU-кэше, читаются одним get_many из кэша
+        Django и одним запросом к таблице key-value store. Промахи
+        запоминаются только на THUMBNAIL_MISS_TIMEOUT секунд, чтобы
+        страница, собираемая сразу после prefetch, не повторяла запрос.
+        """
+        keys = {
+            self.thumbnail_key(file_, geometry, options)
+            for file_ in files if file_
+            for geometry, options in settings.THUMBNAIL_PRESETS
+        }
+        keys = [key for key in keys if self.ready.get(key) is None]
+        if not keys:
+            return
+        kv_cache = default.kvstore.cache
+        values = {
+            key: value for key, value in kv_cache.get_many(keys).items()
+            if isinstance(value, str)
+        }
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(
+                KVStore.objects.filter(key__in=missing).values_list(
+                    'key', 'value'
+                )
+            )
+            kv_cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(found)
+        expires = time.monotonic() + settings.THUMBNAIL_MISS_TIMEOUT
+        for key in keys:
+            if key in values:
+                self.ready.set(key, deserialize_image_file(values[key]))
+            else:
+                self.misses.set(key, expires)
+
+
+backend = ReadyThumbnailBackend()
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def generate(name):
+    """Создаёт миниатюры всех размеров из THUMBNAIL_PRESETS."""
+    for geometry, options in settings.THUMBNAIL_PRESETS:
+        backend.get_thumbnail(source_file(name), geometry, **options)
+    thumbnails_ready.send(sender=ReadyThumbnailBackend, name=name)
+
+
+def generate_missing(name):
+    """Создаёт только отсутствующие миниатюры, возвращает их число."""
+    missing = [
+        (geometry, options)
+        for geometry, options in settings.THUMBNAIL_PRESETS
+        if backend.get_ready_thumbnail(name, geometry, **options) is None
+    ]
+    for geometry, options in missing:
+        backend.get_thumbnail(source_file(name), geometry, **options)
+    if missing:
+        thumbnails_ready.send(sender=ReadyThumbnailBackend, name=name)
+    return len(missing)
+
+
+def _generate_logged(name):
+    # Ошибка миниатюры не должна ронять воркер или сохранение поста.
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+
+
+def _work():
+    while True:
+        name = _jobs.get()
+        try:
+            _generate_logged(name)
+        finally:
+            connections.close_all()
+            _jobs.task_done()
+
+
+def enqueue(name):
+    """Ставит исходник в очередь фонового воркера текущего процесса."""
+    global _worker
+    if not settings.THUMBNAIL_ASYNC:
+        _generate_logged(name)
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work, name='thumbnails', daemon=True
+            )
+            _worker.start()
+    _jobs.put(name)
+
+
+def wait():
+    """Дожидается обработки всех поставленных задач."""
+    _jobs.join()
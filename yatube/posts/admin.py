@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import ranked
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по инвертированному индексу вместо LIKE по тексту."""
+        if not search_term:
+            return queryset, False
+        matches = ranked(search_term).values('post_id')
+        return queryset.filter(pk__in=matches), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
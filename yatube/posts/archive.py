@@ -0,0 +1,93 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from core.db import retry_on_lock
+
+from . import counters, shards
+from .caching import bump_content_version_on_commit
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Post, SearchTerm, TimelineEntry
+)
+
+BATCH_SIZE = 500
+
+
+def cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+@retry_on_lock
+def archive_batch(alias, pks):
+    """Переносит посты alias с этими id и их комментарии в архив.
+
+    Строки удаляются без сигналов: счётчики постов у автора и группы
+    и ссылки на картинки учитывают архив, а индекс поиска и ленты
+    подписок чистятся здесь же. Возвращает число перенесённых постов.
+    """
+    posts = list(Post.objects.using(alias).filter(pk__in=pks))
+    pks = [post.pk for post in posts]
+    comments = Comment.objects.using(alias).filter(post_id__in=pks)
+    ArchivedPost.objects.bulk_create(
+        (
+            ArchivedPost(
+                id=post.pk,
+                text=post.text,
+                pub_date=post.pub_date,
+                author_id=post.author_id,
+                group_id=post.group_id,
+                image=post.image.name,
+                comments_count=post.comments_count,
+                updated=post.updated,
+            )
+            for post in posts
+        ),
+        ignore_conflicts=True,
+    )
+    ArchivedComment.objects.bulk_create(
+        (
+            ArchivedComment(
+                id=comment.pk,
+                post_id=comment.post_id,
+                author_id=comment.author_id,
+                text=comment.text,
+                created=comment.created,
+            )
+            for comment in comments.order_by('pk').iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    SearchTerm.objects.filter(post_id__in=pks).delete()
+    TimelineEntry.objects.filter(post_id__in=pks).delete()
+    comments._raw_delete(alias)
+    Post.objects.using(alias).filter(pk__in=pks)._raw_delete(alias)
+    authors = Counter(post.author_id for post in posts)
+    for author_id, total in authors.items():
+        counters.change_archived(author_id, total)
+    return len(posts)
+
+
+def archive_older_than(before, batch_size=BATCH_SIZE):
+    """Переносит в архив посты старше before пачками по batch_size.
+
+    Каждая пачка — отдельная транзакция, так что блокировки держатся
+    недолго. Отдаёт число постов в каждой перенесённой пачке.
+    """
+    for posts in shards.each(Post.objects.filter(pub_date__lt=before)):
+        alias = posts._db or DEFAULT_DB_ALIAS
+        old = posts.using(alias).order_by('pub_date', 'pk').values_list(
+            'pk', flat=True
+        )
+        while True:
+            pks = list(old[:batch_size])
+            if not pks:
+                break
+            moved = archive_batch(alias, pks)
+            bump_content_version_on_commit()
+            yield moved
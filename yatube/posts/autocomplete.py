@@ -0,0 +1,196 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import NoReverseMatch, reverse
+
+from .models import Group
+
+User = get_user_model()
+
+VERSION_KEY = 'posts:autocomplete_version'
+CHANGE_KEY = 'posts:autocomplete_change:{}'
+# Сколько хранить изменения и сколько их применять по одному: процесс,
+# отставший сильнее, перечитывает таблицы целиком.
+CHANGE_TIMEOUT = 3600
+MAX_CHANGES = 100
+LIMIT = 10
+
+
+def _version():
+    # Начальное значение из времени: после вытеснения ключа версия
+    # не повторится, и старые изменения не применятся к новой.
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _publish(change):
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        return
+    cache.set(CHANGE_KEY.format(version), change, CHANGE_TIMEOUT)
+
+
+def _url(name, arg):
+    # В базе могут быть slug, которые не принимает шаблон URL.
+    try:
+        return reverse(name, args=(arg,))
+    except NoReverseMatch:
+        return None
+
+
+def _user_entry(pk, username):
+    return (
+        ('user', pk),
+        [username.lower()],
+        {
+            'type': 'user',
+            'label': username,
+            'url': _url('posts:profile', username),
+        },
+    )
+
+
+def _group_entry(pk, slug, title):
+    return (
+        ('group', pk),
+        sorted({slug.lower(), title.lower()}),
+        {
+            'type': 'group',
+            'label': title,
+            'url': _url('posts:group_list', slug),
+        },
+    )
+
+
+class PrefixIndex:
+    """Отсортированный массив ключей для поиска по префиксу через bisect.
+
+    Ключ — (строка в нижнем регистре, тип, id); поиск занимает
+    O(log n + k) и не обращается к базе. Изменения публикуются в кэше
+    под номером версии, и каждый процесс применяет их к своей копии
+    индекса. Поэтому при нескольких процессах нужен SHARED_CACHE: с
+    LocMemCache процесс не увидит изменений, сделанных в других.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._owned = {}
+        self._results = {}
+        self._version = None
+
+    def _load(self, version):
+        entries = [
+            _user_entry(*row)
+            for row in User.objects.values_list('pk', 'username').iterator()
+        ] + [
+            _group_entry(*row)
+            for row in Group.objects.values_list(
+                'pk', 'slug', 'title'
+            ).iterator()
+        ]
+        keys = sorted(
+            (text, *owner)
+            for owner, texts, _ in entries for text in texts
+        )
+        with self._lock:
+            if self._version is not None and self._version > version:
+                return
+            self._keys = keys
+            self._owned = {owner: texts for owner, texts, _ in entries}
+            self._results = {owner: result for owner, _, result in entries}
+            self._version = version
+
+    def _changes(self, start, version):
+        """Изменения между версиями или None, если их уже нет в кэше."""
+        if start is None or not 0 < version - start <= MAX_CHANGES:
+            return None
+        keys = [
+            CHANGE_KEY.format(number)
+            for number in range(start + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return None
+        return [changes[key] for key in keys]
+
+    def _ensure_loaded(self):
+        version = _version()
+        start = self._version
+        if start == version:
+            return
+        changes = self._changes(start, version)
+        if changes is None:
+            self._load(version)
+            return
+        with self._lock:
+            # Другой поток мог успеть применить эти изменения.
+            if self._version != start:
+                return
+            for action, arg in changes:
+                if action == 'put':
+                    self._put(arg)
+                else:
+                    self._remove(arg)
+            self._version = version
+
+    def _remove(self, owner):
+        for text in self._owned.pop(owner, ()):
+            key = (text, *owner)
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+        self._results.pop(owner, None)
+
+    def _put(self, entry):
+        owner, texts, result = entry
+        self._remove(owner)
+        for text in texts:
+            key = (text, *owner)
+            self._keys.insert(bisect_left(self._keys, key), key)
+        self._owned[owner] = texts
+        self._results[owner] = result
+
+    def put(self, entry):
+        _publish(('put', entry))
+
+    def discard(self, owner):
+        _publish(('remove', owner))
+
+    def lookup(self, prefix, limit=LIMIT):
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._ensure_loaded()
+        found = {}
+        with self._lock:
+            keys, results = self._keys, self._results
+            index = bisect_left(keys, (prefix,))
+            while index < len(keys) and len(found) < limit:
+                text, *owner = keys[index]
+                if not text.startswith(prefix):
+                    break
+                owner = tuple(owner)
+                if owner not in found and owner in results:
+                    found[owner] = results[owner]
+                index += 1
+        return list(found.values())
+
+
+index = PrefixIndex()
+
+
+def user_entry(user):
+    return _user_entry(user.pk, user.username)
+
+
+def group_entry(group):
+    return _group_entry(group.pk, group.slug, group.title)
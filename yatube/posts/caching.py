@@ -0,0 +1,127 @@
+import hashlib
+import time
+from datetime import timedelta
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core.caching import get_or_compute, served_stale
+from core.replicas import reading_replica, use_primary
+
+CONTENT_VERSION_KEY = 'posts:content_version'
+CONTENT_MODIFIED_KEY = 'posts:content_modified'
+
+
+def content_version():
+    """Текущая версия контента лент, входит в ключи кэша фрагментов.
+
+    Начальное значение берётся из времени, чтобы после вытеснения ключа
+    версия не вернулась к уже использованной и старые фрагменты не ожили.
+    """
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(CONTENT_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CONTENT_VERSION_KEY)
+    return version
+
+
+def content_modified():
+    """Время последнего изменения контента для заголовка Last-Modified."""
+    modified = cache.get(CONTENT_MODIFIED_KEY)
+    if modified is None:
+        cache.add(CONTENT_MODIFIED_KEY, timezone.now(), None)
+        modified = cache.get(CONTENT_MODIFIED_KEY)
+    return modified
+
+
+def bump_content_version():
+    cache.set(CONTENT_MODIFIED_KEY, timezone.now(), None)
+    try:
+        cache.incr(CONTENT_VERSION_KEY)
+    except ValueError:
+        cache.add(CONTENT_VERSION_KEY, time.time_ns(), None)
+
+
+def bump_content_version_on_commit():
+    """Сдвигает версию контента сейчас и ещё раз после коммита.
+
+    Читатель, успевший до коммита собрать страницу из старых данных,
+    положит её под промежуточную версию, и после коммита её никто
+    не прочитает. Первый сдвиг нужен, когда транзакция не фиксируется
+    на этом соединении, например в тестах с откатом после каждого теста.
+    """
+    bump_content_version()
+    transaction.on_commit(bump_content_version)
+
+
+def replica_may_lag():
+    """Реплика могла ещё не получить последнее изменение контента."""
+    return reading_replica() and timezone.now() - content_modified() < (
+        timedelta(seconds=settings.REPLICA_LAG)
+    )
+
+
+def _set_validators(response, version, modified):
+    response['ETag'] = quote_etag(str(version))
+    response['Last-Modified'] = http_date(modified.timestamp())
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницу целиком для анонимных пользователей.
+
+    Ответ хранится под ключом из полного пути с query string вместе с
+    версией контента, поэтому любое изменение постов, групп или
+    комментариев даёт новую страницу. Пересобирает её один запрос,
+    остальные в это время получают прежнюю. ETag и Last-Modified берутся
+    из версии, с которой страница собрана, и позволяют браузеру получить
+    304 Not Modified без тела ответа. Страница, собранная из устаревших
+    фрагментов, отдаётся без них. Вскоре после изменения страница для
+    кэша читается из основной базы: реплика может отставать.
+    """
+    def cached_view(request, *args, **kwargs):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        version, modified = content_version(), content_modified()
+        rendered = []
+
+        def render():
+            if replica_may_lag():
+                use_primary()
+            response = view(request, *args, **kwargs)
+            rendered.append(response)
+            # Ошибки и ответы с cookie не кэшируются: вместо них в кэше
+            # None, и страница собирается заново в каждом запросе.
+            if response.status_code != HTTPStatus.OK or response.cookies:
+                return None
+            if not served_stale():
+                _set_validators(response, version, modified)
+            return response
+
+        response = get_or_compute(
+            f'page:{path}', render, settings.PAGE_CACHE_TIMEOUT,
+            version=version,
+        )
+        if response is None:
+            response = rendered[0] if rendered else view(
+                request, *args, **kwargs
+            )
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified')
+            ),
+            response=response,
+        )
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        return cached_view(request, *args, **kwargs)
+    return wrapper
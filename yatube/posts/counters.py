@@ -0,0 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import shards
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, MediaFile, Post,
+    UserStats,
+)
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _change_user(user_id, field, delta):
+    with transaction.atomic():
+        if delta > 0:
+            UserStats.objects.get_or_create(user_id=user_id)
+        stats = UserStats.objects.filter(user_id=user_id)
+        stats.update(**{field: F(field) + delta})
+        return stats.values_list(field, flat=True).first() or 0
+
+
+def change_followers(author_id, delta):
+    """Сдвигает счётчик подписчиков автора и возвращает новое значение."""
+    return _change_user(author_id, 'followers_count', delta)
+
+
+def change_following(user_id, delta):
+    return _change_user(user_id, 'following_count', delta)
+
+
+def change_posts(author_id, delta):
+    return _change_user(author_id, 'posts_count', delta)
+
+
+def change_archived(author_id, delta):
+    return _change_user(author_id, 'archived_count', delta)
+
+
+def change_group_posts(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F('posts_count') + delta
+        )
+
+
+def change_comments(post_id, delta):
+    if post_id is not None:
+        shards.by_pk(Post.objects.filter(pk=post_id), post_id).update(
+            comments_count=F('comments_count') + delta
+        )
+
+
+def change_media_refs(name, delta):
+    """Сдвигает число постов, ссылающихся на файл, и возвращает его."""
+    if not name:
+        return None
+    with transaction.atomic():
+        if delta > 0:
+            MediaFile.objects.get_or_create(name=name)
+        media = MediaFile.objects.filter(name=name)
+        media.update(refs=F('refs') + delta)
+        return media.values_list('refs', flat=True).first() or 0
+
+
+def _count(model, field, outer='pk'):
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def _fix(queryset, counters):
+    """Исправляет строки, у которых счётчики разошлись с реальными.
+
+    Строки читаются пачками по первичному ключу, так что память
+    не зависит от размера таблицы.
+    """
+    queryset = queryset.annotate(
+        **{f'actual_{field}': value for field, value in counters.items()}
+    ).order_by('pk')
+    fixed = 0
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not rows:
+            return fixed
+        last_pk = rows[-1].pk
+        drifted = []
+        for obj in rows:
+            changed = False
+            for field in counters:
+                actual = getattr(obj, f'actual_{field}')
+                if getattr(obj, field) != actual:
+                    setattr(obj, field, actual)
+                    changed = True
+            if changed:
+                drifted.append(obj)
+        queryset.model.objects.bulk_update(drifted, list(counters))
+        fixed += len(drifted)
+
+
+def reconcile():
+    """Пересчитывает все счётчики и возвращает число исправленных строк."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    named = MediaFile.objects.values('name')
+    for model in (Post, ArchivedPost):
+        images = model.objects.exclude(image='').exclude(image__in=named)
+        MediaFile.objects.bulk_create(
+            (
+                MediaFile(name=name) for name in
+                images.values_list('image', flat=True).distinct().iterator()
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    return {
+        'users': _fix(UserStats.objects.all(), {
+            'posts_count': (
+                _count(Post, 'author', 'user_id')
+                + _count(ArchivedPost, 'author', 'user_id')
+            ),
+            'archived_count': _count(ArchivedPost, 'author', 'user_id'),
+            'followers_count': _count(Follow, 'author', 'user_id'),
+            'following_count': _count(Follow, 'user', 'user_id'),
+        }),
+        'groups': _fix(Group.objects.all(), {
+            'posts_count': (
+                _count(Post, 'group') + _count(ArchivedPost, 'group')
+            ),
+        }),
+        'posts': _fix(Post.objects.all(), {
+            'comments_count': _count(Comment, 'post'),
+        }),
+        'archived': _fix(ArchivedPost.objects.all(), {
+            'comments_count': _count(ArchivedComment, 'post'),
+        }),
+        'media': _fix(MediaFile.objects.all(), {
+            'refs': (
+                _count(Post, 'image', 'name')
+                + _count(ArchivedPost, 'image', 'name')
+            ),
+        }),
+    }
@@ -1,14 +1,44 @@
+from io import BytesIO
+
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from PIL import Image, ImageOps
 
 from .models import Post, Comment
 
 
+def normalize_image(upload):
+    """Поворачивает картинку по EXIF, удаляет метаданные и ограничивает
+    размер IMAGE_MAX_SIZE. Анимированные картинки не трогает."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = image.format
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE))
+        options = {'quality': 85} if image_format == 'JPEG' else {}
+        buffer = BytesIO()
+        image.save(buffer, image_format, optimize=True, **options)
+    return SimpleUploadedFile(
+        upload.name, buffer.getvalue(), upload.content_type
+    )
+
+
 class PostForm(forms.ModelForm):
 
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит старые посты вместе с комментариями в архивные таблицы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help='Архивировать посты старше стольких дней',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=archive.BATCH_SIZE,
+            help='Сколько постов переносить одной транзакцией',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза в секундах между пачками',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        moved = batches = 0
+        for total in archive.archive_older_than(
+            archive.cutoff(options['days']), options['batch_size']
+        ):
+            moved += total
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено постов: {moved}, пачек: {batches}, '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,105 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import thumbnails
+from posts import shards
+from posts.models import ArchivedPost, Post
+
+ARCHIVE = 'archive'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры для картинок всех постов '
+        'во всех шардах и в архиве'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов читать из базы за раз',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — работать в текущем процессе',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=(
+                'Файл с шардом и pk последнего обработанного поста '
+                'для продолжения'
+            ),
+        )
+
+    def sources(self):
+        for posts in shards.each(Post.objects.exclude(image='')):
+            yield posts._db or DEFAULT_DB_ALIAS, posts
+        yield ARCHIVE, ArchivedPost.objects.exclude(image='')
+
+    def batches(self, start, size):
+        """Пачки [(pk, image)] по шардам и архиву с их источником.
+
+        start — (источник, pk) из контрольной точки: более ранние
+        источники пропускаются, в нём берутся посты после pk.
+        """
+        sources = list(self.sources())
+        labels = [label for label, _ in sources]
+        label, after = start or (labels[0], 0)
+        if label not in labels:
+            raise CommandError(f'В контрольной точке неизвестный шард {label}')
+        for label, posts in sources[labels.index(label):]:
+            posts = posts.order_by('pk')
+            while True:
+                batch = list(
+                    posts.filter(pk__gt=after).values_list(
+                        'pk', 'image'
+                    )[:size]
+                )
+                if not batch:
+                    break
+                yield label, batch
+                after = batch[-1][0]
+            after = 0
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] and Path(options['checkpoint'])
+        start = None
+        if checkpoint and checkpoint.exists():
+            label, after = checkpoint.read_text().split()
+            start = label, int(after)
+            self.stdout.write(f'Продолжаем после поста {after} в {label}')
+        pool = None
+        if options['workers']:
+            # Дочерние процессы не должны делить соединение с родителем.
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=options['workers'])
+        run = pool.map if pool else map
+        images = created = 0
+        started = time.monotonic()
+        try:
+            for label, batch in self.batches(start, options['batch_size']):
+                names = [image for _, image in batch]
+                created += sum(run(thumbnails.generate_missing, names))
+                images += len(names)
+                if checkpoint:
+                    checkpoint.write_text(f'{label} {batch[-1][0]}')
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Картинок: {images}, миниатюр создано: {created}, '
+                    f'{images / elapsed:.1f} картинок/с'
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+        if checkpoint and checkpoint.exists():
+            checkpoint.unlink()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {images} картинок, {created} миниатюр '
+            f'за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, Timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет материализованные ленты подписок по существующим Follow '
+        'и раскладывает посты авторов, опустившихся ниже FEED_PULL_THRESHOLD'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перестроить и уже готовые ленты',
+        )
+
+    def handle(self, *args, **options):
+        readers = Follow.objects.values_list('user_id', flat=True).distinct()
+        if not options['all']:
+            ready = Timeline.objects.filter(ready=True).values('user_id')
+            readers = readers.exclude(user_id__in=ready)
+        rebuilt = 0
+        for user_id in readers.order_by('user_id').iterator():
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        pushed = timeline.push_fallen_authors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент заполнено: {rebuilt}, авторов разложено: {pushed}'
+        ))
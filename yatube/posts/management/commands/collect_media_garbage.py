@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import media
+from posts.models import Post
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылаются посты, '
+        'и миниатюры, которых нет в key-value store'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов проверять одним запросом',
+        )
+        parser.add_argument(
+            '--grace', type=int, default=24 * 60 * 60,
+            help='Не трогать файлы моложе стольких секунд',
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Проверить не больше стольких файлов за запуск',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с последним проверенным путём для продолжения',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено',
+        )
+
+    def roots(self):
+        """Каталоги для обхода с функциями поиска и удаления сирот."""
+        upload_to = Post._meta.get_field('image').upload_to
+        return (
+            (
+                default.storage,
+                sorl_settings.THUMBNAIL_PREFIX.rstrip('/'),
+                media.orphan_thumbnails,
+                media.delete_thumbnail,
+            ),
+            (
+                default_storage,
+                upload_to.rstrip('/'),
+                media.orphan_sources,
+                media.delete_source,
+            ),
+        )
+
+    def sweep(self, storage, orphans, remove, cutoff, dry_run):
+        """Удаляет старые сироты и отдаёт размер каждого удалённого файла.
+
+        remove возвращает None, если файл снова используется.
+        """
+        for name in orphans:
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            if dry_run:
+                self.stdout.write(f'Удалить: {name}')
+                yield 0
+                continue
+            size = remove(name)
+            if size is not None:
+                yield size
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] and Path(options['checkpoint'])
+        after = ''
+        if checkpoint and checkpoint.exists():
+            after = checkpoint.read_text()
+            self.stdout.write(f'Продолжаем после {after}')
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        limit = options['limit']
+        scanned = deleted = reclaimed = 0
+        started = time.monotonic()
+        # Каталоги обходятся по алфавиту, чтобы checkpoint был общим.
+        for storage, root, find, remove in sorted(
+            self.roots(), key=lambda root: root[1]
+        ):
+            names = media.walk(storage, root, after)
+            if limit is not None:
+                names = islice(names, max(limit - scanned, 0))
+            for batch in batched(names, options['batch_size']):
+                scanned += len(batch)
+                for size in self.sweep(
+                    storage, find(batch), remove, cutoff, options['dry_run']
+                ):
+                    reclaimed += size
+                    deleted += 1
+                if checkpoint and not options['dry_run']:
+                    checkpoint.write_text(batch[-1])
+        finished = limit is None or scanned < limit
+        if checkpoint and finished and checkpoint.exists():
+            checkpoint.unlink()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}, удалено: {deleted}, '
+            f'освобождено {reclaimed / 1024 / 1024:.1f} МБ '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
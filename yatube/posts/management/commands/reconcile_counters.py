@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters, shards
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения'
+
+    def handle(self, *args, **options):
+        if shards.enabled():
+            # Счётчики считаются JOIN с постами, а посты лежат в шардах.
+            raise CommandError('Сверка не поддерживает шардирование постов')
+        fixed = counters.reconcile()
+        for name, total in fixed.items():
+            self.stdout.write(f'{name}: исправлено {total}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Max
+from django.test.utils import override_settings
+
+from core.db import retry_on_lock
+from posts import shards
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, Post, SearchTerm, ShardSequence,
+    TimelineEntry,
+)
+
+BATCH_SIZE = 500
+
+
+def reserve_sequence():
+    """Поднимает последовательность id шардов выше всех старых id.
+
+    Возвращает наибольший старый id: новые id постов и комментариев
+    больше него и не совпадут ни со старыми, ни с архивными.
+    """
+    top = max(
+        model.objects.using(DEFAULT_DB_ALIAS).aggregate(
+            top=Max('pk')
+        )['top'] or 0
+        for model in (Post, Comment, ArchivedPost, ArchivedComment)
+    )
+    ShardSequence.objects.using(DEFAULT_DB_ALIAS).create(
+        pk=top // shards.SLOTS + 1
+    ).delete()
+    return top
+
+
+def insert(model, alias, objs):
+    # raw сохраняет pub_date, updated и created как есть: при обычной
+    # вставке auto_now заменил бы их текущим временем.
+    for start in range(0, len(objs), BATCH_SIZE):
+        model.objects.using(alias)._insert(
+            objs[start:start + BATCH_SIZE],
+            fields=model._meta.local_concrete_fields,
+            raw=True,
+            using=alias,
+        )
+
+
+@retry_on_lock
+def move_batch(pks):
+    """Переносит посты default с этими id и их комментарии в шарды.
+
+    Посты получают новые id с индексом шарда, индекс поиска переводится
+    на них, записи лент подписок удаляются: при шардировании лента
+    собирается из шардов. Возвращает число перенесённых постов.
+    """
+    posts = list(Post.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=pks))
+    pks = [post.pk for post in posts]
+    comments = defaultdict(list)
+    legacy_comments = Comment.objects.using(DEFAULT_DB_ALIAS).filter(
+        post_id__in=pks
+    )
+    for comment in legacy_comments:
+        comments[comment.post_id].append(comment)
+    rows = defaultdict(lambda: ([], []))
+    for post in posts:
+        alias = shards.shard_for_author(post.author_id)
+        old_pk, post.pk = post.pk, shards.allocate_pk(alias)
+        SearchTerm.objects.filter(post_id=old_pk).update(post_id=post.pk)
+        rows[alias][0].append(post)
+        for comment in comments[old_pk]:
+            comment.pk = shards.allocate_pk(alias)
+            comment.post_id = post.pk
+            rows[alias][1].append(comment)
+    for alias, (shard_posts, shard_comments) in rows.items():
+        insert(Post, alias, shard_posts)
+        insert(Comment, alias, shard_comments)
+    TimelineEntry.objects.filter(post_id__in=pks).delete()
+    legacy_comments._raw_delete(DEFAULT_DB_ALIAS)
+    Post.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=pks)._raw_delete(
+        DEFAULT_DB_ALIAS
+    )
+    return len(posts)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты и комментарии из default в шарды. Запускается '
+        'до включения POST_SHARDS с тем же списком шардов в том же порядке'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'shards', nargs='+',
+            help='Алиасы шардов из DATABASES в порядке POST_SHARDS',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов переносить одной транзакцией',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['shards']
+        unknown = set(aliases) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError(f'Нет в DATABASES: {", ".join(unknown)}')
+        if settings.POST_SHARDS and settings.POST_SHARDS != aliases:
+            raise CommandError(
+                f'POST_SHARDS уже задан иначе: {settings.POST_SHARDS}'
+            )
+        moved = 0
+        with override_settings(POST_SHARDS=aliases):
+            # Соединения откроются заново без проверки внешних ключей:
+            # индекс поиска в default будет ссылаться на посты в шардах.
+            connections.close_all()
+            top = reserve_sequence()
+            legacy = Post.objects.using(DEFAULT_DB_ALIAS).filter(
+                pk__lte=top
+            ).order_by('pk').values_list('pk', flat=True)
+            while True:
+                pks = list(legacy[:options['batch_size']])
+                if not pks:
+                    break
+                moved += move_batch(pks)
+                self.stdout.write(f'Перенесено постов: {moved}')
+        connections.close_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Посты перенесены в шарды: {moved}'
+        ))
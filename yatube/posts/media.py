@@ -0,0 +1,115 @@
+import logging
+import posixpath
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.thumbnails import source_file
+
+from . import shards
+from .models import ArchivedPost, MediaFile, Post
+
+logger = logging.getLogger(__name__)
+
+
+def release(name):
+    """Удаляет файл и его миниатюры, если на него не ссылается ни один пост.
+
+    Счётчик проверяется ещё раз: между обнулением и вызовом ту же
+    картинку мог загрузить другой пост.
+    """
+    deleted, _ = MediaFile.objects.filter(name=name, refs=0).delete()
+    if not deleted:
+        return
+    try:
+        delete(source_file(name))
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Не удалось удалить файл %s', name, exc_info=True)
+
+
+def walk(storage, directory, after=''):
+    """Имена файлов каталога хранилища по возрастанию, начиная после after.
+
+    В памяти одновременно держится только листинг текущего каталога,
+    а подкаталоги, целиком лежащие до after, не читаются.
+    """
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    entries = sorted(
+        [(name + '/', True) for name in directories]
+        + [(name, False) for name in files]
+    )
+    for name, is_directory in entries:
+        path = posixpath.join(directory, name)
+        if is_directory:
+            if path > after or after.startswith(path):
+                yield from walk(storage, path.rstrip('/'), after)
+        elif path > after:
+            yield path
+
+
+def orphan_sources(names):
+    """Картинки из names, на которые не ссылается ни один пост."""
+    referenced = set(
+        ArchivedPost.objects.filter(image__in=names).values_list(
+            'image', flat=True
+        )
+    )
+    for posts in shards.each(Post.objects.filter(image__in=names)):
+        referenced.update(posts.values_list('image', flat=True))
+    return [name for name in names if name not in referenced]
+
+
+def orphan_thumbnails(names):
+    """Файлы миниатюр из names, которых нет в key-value store sorl."""
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in names
+    }
+    known = set(
+        KVStore.objects.filter(key__in=keys).values_list('key', flat=True)
+    )
+    return [name for key, name in keys.items() if key not in known]
+
+
+def _size(storage, name):
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
+
+
+def delete_source(name):
+    """Удаляет картинку с её миниатюрами и возвращает число байт.
+
+    Сначала удаляется строка MediaFile с refs=0. Если строка со ссылками
+    осталась, файл успели загрузить заново: хранилище по хэшу отдаёт
+    тот же файл без нового mtime, так что --grace его не защищает.
+    Тогда файл не трогается и возвращается None.
+    """
+    with transaction.atomic():
+        MediaFile.objects.filter(name=name, refs=0).delete()
+        if MediaFile.objects.filter(name=name).exists():
+            return None
+        source = source_file(name)
+        thumbnails = default.kvstore._get(
+            source.key, identity='thumbnails'
+        ) or []
+        size = _size(source.storage, name) + sum(
+            _size(thumbnail.storage, thumbnail.name)
+            for thumbnail in map(default.kvstore._get, thumbnails)
+            if thumbnail is not None
+        )
+        delete(source)
+    return size
+
+
+def delete_thumbnail(name):
+    size = _size(default.storage, name)
+    default.storage.delete(name)
+    return size
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field, outer='pk'):
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserStats = apps.get_model('posts', 'UserStats')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        batch_size=500,
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_userstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='комментариев'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='подписок'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='постов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_media(apps, schema_editor):
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    Post = apps.get_model('posts', 'Post')
+    images = Post.objects.exclude(image='').values('image').annotate(
+        refs=Count('pk')
+    ).order_by()
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=row['image'], refs=row['refs']) for row in images],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+        migrations.RunPython(fill_media, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:46
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def tokenize(text):
+    # Копия posts.search.tokenize на момент миграции: миграция не должна
+    # меняться вместе с кодом приложения.
+    words = re.findall(r'\w+', text.lower().replace('ё', 'е'))
+    return Counter(
+        word for word in words
+        if len(word) <= 40 and (len(word) >= 2 or word.isdigit())
+    )
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            return
+        SearchTerm.objects.bulk_create([
+            SearchTerm(token=token, post_id=post_id, weight=min(count, 32767))
+            for post_id, text in batch
+            for token, count in tokenize(text).items()
+        ])
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_mediafile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=40, verbose_name='слово')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('token', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Номер строки в шардах',
+                'verbose_name_plural': 'Последовательность id в шардах',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_timelineentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, upload_to='posts/', verbose_name='картинка'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, upload_to='posts/', verbose_name='картинка'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_PULL_THRESHOLD
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_image_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='посты подмешиваются в ленты при чтении'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
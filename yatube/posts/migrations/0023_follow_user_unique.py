@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_userstats_pulled'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='follow',
+            name='unique_follow',
+        ),
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_user_idx',
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='подписчик'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
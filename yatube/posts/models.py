@@ -8,10 +8,21 @@ User = get_user_model()
 SHORT_DESCRIPTION = 15
 
 
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # Без явного using базу выбирает роутер по самому объекту:
+        # при шардировании она зависит от автора поста.
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
 class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField('Каталог', unique=True)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField('Постов', default=0)
 
     class Meta:
         verbose_name = 'Группа'
@@ -32,6 +43,7 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
+        db_index=False,
         verbose_name='автор'
     )
     group = models.ForeignKey(
@@ -40,18 +52,34 @@ class Post(models.Model):
         null=True,
         on_delete=models.SET_NULL,
         related_name='posts',
+        db_index=False,
         verbose_name='сообщество',
     )
     image = models.ImageField(
         'картинка',
         upload_to='posts/',
         blank=True,
+        db_index=True,
     )
+    comments_count = models.PositiveIntegerField('комментариев', default=0)
+    updated = models.DateTimeField(auto_now=True, verbose_name='изменён')
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:SHORT_DESCRIPTION]
@@ -64,6 +92,7 @@ class Comment(models.Model):
         null=True,
         on_delete=models.SET_NULL,
         related_name='comments',
+        db_index=False,
         verbose_name='пост',
     )
     author = models.ForeignKey(
@@ -78,10 +107,18 @@ class Comment(models.Model):
         verbose_name='дата публикации'
     )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:SHORT_DESCRIPTION]
@@ -93,6 +130,7 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
+        db_index=False,
         verbose_name='подписчик',
     )
     author = models.ForeignKey(
@@ -107,7 +145,7 @@ class Follow(models.Model):
         verbose_name_plural = 'Подписки'
         constraints = [
             models.UniqueConstraint(
-                fields=['author', 'user'],
+                fields=['user', 'author'],
                 name='unique_follow'
             ),
         ]
@@ -119,3 +157,218 @@ class Follow(models.Model):
         super().clean()
         if self.user == self.author:
             raise ValidationError('Самоподписка недоступна.')
+
+
+class Timeline(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='читатель',
+    )
+    ready = models.BooleanField('заполнена', default=False)
+
+    class Meta:
+        verbose_name = 'Лента подписок'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+    )
+    pub_date = models.DateTimeField('дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post_id}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='пользователь',
+    )
+    posts_count = models.PositiveIntegerField('постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'подписчиков',
+        default=0,
+        db_index=True,
+    )
+    following_count = models.PositiveIntegerField('подписок', default=0)
+    archived_count = models.PositiveIntegerField('постов в архиве', default=0)
+    pulled = models.BooleanField(
+        'посты подмешиваются в ленты при чтении',
+        default=False,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class MediaFile(models.Model):
+    name = models.CharField('файл', max_length=100, unique=True)
+    refs = models.PositiveIntegerField('ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
+
+
+class SearchTerm(models.Model):
+    token = models.CharField('слово', max_length=40)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='пост',
+    )
+    weight = models.PositiveSmallIntegerField('вхождений', default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('token', 'post'),
+                name='unique_search_term',
+            ),
+        ]
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+
+    def __str__(self):
+        return f'{self.token} -> {self.post_id}'
+
+
+class ShardSequence(models.Model):
+    class Meta:
+        verbose_name = 'Номер строки в шардах'
+        verbose_name_plural = 'Последовательность id в шардах'
+
+    def __str__(self):
+        return str(self.pk)
+
+
+class ArchivedPost(models.Model):
+    """Пост, перенесённый из posts_post командой archive_posts.
+
+    id совпадает с id поста, поэтому ссылки на пост продолжают работать.
+    """
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='текст')
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        db_index=False,
+        verbose_name='автор'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='сообщество',
+    )
+    image = models.ImageField(
+        'картинка',
+        upload_to='posts/',
+        blank=True,
+        db_index=True,
+    )
+    comments_count = models.PositiveIntegerField('комментариев', default=0)
+    updated = models.DateTimeField(verbose_name='изменён')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архив постов'
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='archived_author_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:SHORT_DESCRIPTION]
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        db_index=False,
+        verbose_name='пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='автор'
+    )
+    text = models.TextField('текст')
+    created = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='archived_post_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:SHORT_DESCRIPTION]
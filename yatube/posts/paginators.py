@@ -0,0 +1,186 @@
+import hashlib
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from core.caching import stampede_cached
+
+CURSOR_PARAMS = ('after', 'before')
+CURSOR_SEPARATOR = '|'
+PAGES_ON_EACH_SIDE = 2
+PAGES_ON_ENDS = 1
+
+
+def encode_cursor(post):
+    """Превращает ключ (pub_date, id) поста в непрозрачный токен."""
+    raw = f'{post.pub_date.isoformat()}{CURSOR_SEPARATOR}{post.pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен испорчен."""
+    try:
+        raw = urlsafe_base64_decode(token).decode()
+        pub_date, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по индексу pub_date, поэтому стоимость
+    запроса не зависит от того, насколько глубоко листает пользователь.
+    """
+    keyset = True
+    ordering = ('-pub_date', '-pk')
+    encode_cursor = staticmethod(encode_cursor)
+    decode_cursor = staticmethod(decode_cursor)
+
+    def get_cursor_page(self, after=None, before=None):
+        if before:
+            key = self.decode_cursor(before)
+            if key is not None:
+                page = self._page_before(*key)
+                if page.has_previous():
+                    return page
+        elif after:
+            key = self.decode_cursor(after)
+            if key is not None:
+                return self._page_after(*key)
+        return self._first_page()
+
+    def _first_page(self):
+        queryset = self.object_list.order_by(*self.ordering)
+        rows = list(queryset[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page,
+            has_previous=False,
+        )
+
+    def _page_after(self, pub_date, pk):
+        queryset = self.object_list.filter(
+            Q(pub_date__lte=pub_date),
+            Q(pub_date__lt=pub_date) | Q(pk__lt=pk),
+        ).order_by(*self.ordering)
+        rows = list(queryset[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page,
+            has_previous=True,
+        )
+
+    def _page_before(self, pub_date, pk):
+        queryset = self.object_list.filter(
+            Q(pub_date__gte=pub_date),
+            Q(pub_date__gt=pub_date) | Q(pk__gt=pk),
+        ).order_by('pub_date', 'pk')
+        rows = list(queryset[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page][::-1], self,
+            has_next=True,
+            has_previous=len(rows) > self.per_page,
+        )
+
+
+def count_cache_key(object_list):
+    streams = getattr(object_list, 'streams', [object_list])
+    query = '|'.join(str(stream.query) for stream in streams)
+    return 'paginator_count:' + hashlib.md5(query.encode()).hexdigest()
+
+
+@stampede_cached(
+    key=count_cache_key,
+    timeout=lambda: settings.PAGINATOR_COUNT_TIMEOUT,
+)
+def cached_count(object_list):
+    return object_list.count()
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator с закэшированным числом постов.
+
+    Результат COUNT(*) живёт в кэше PAGINATOR_COUNT_TIMEOUT секунд и
+    при записи постов не сбрасывается: устаревшее число лишь сдвигает
+    номера страниц, срез страницы по нему не обрезается.
+    Вместо полного page_range страница получает elided_page_range:
+    первые, последние и соседние с текущим номера страниц.
+    """
+    ELLIPSIS = '…'
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+    def get_elided_page_range(self, number=1, on_each_side=PAGES_ON_EACH_SIDE,
+                              on_ends=PAGES_ON_ENDS):
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def page(self, number):
+        # Срез не обрезается по count: устаревший счётчик не должен прятать
+        # свежие посты с последней страницы.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        return self._get_page(self.object_list[bottom:top], number, self)
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number)
+        )
+        return page
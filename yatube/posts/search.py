@@ -0,0 +1,212 @@
+import math
+import re
+from collections import Counter
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, FloatField, Q, Sum, When
+)
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import shards
+from .models import Post, SearchTerm
+from .paginators import CURSOR_SEPARATOR, CursorPage, cached_count
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+MAX_QUERY_TOKENS = 8
+MAX_WEIGHT = 32767
+BATCH_SIZE = 500
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре с числом их вхождений."""
+    words = TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+    return Counter(
+        word for word in words
+        if len(word) <= MAX_TOKEN_LENGTH
+        and (len(word) >= MIN_TOKEN_LENGTH or word.isdigit())
+    )
+
+
+def _terms(post):
+    return [
+        SearchTerm(token=token, post=post, weight=min(count, MAX_WEIGHT))
+        for token, count in tokenize(post.text).items()
+    ]
+
+
+def index_post(post):
+    """Перестраивает записи индекса для одного поста."""
+    with transaction.atomic():
+        SearchTerm.objects.filter(post=post).delete()
+        SearchTerm.objects.bulk_create(_terms(post))
+
+
+def rebuild():
+    """Перестраивает весь индекс пачками постов, возвращает их число."""
+    SearchTerm.objects.all().delete()
+    indexed = 0
+    for posts in shards.each(Post.objects.order_by('pk').only('pk', 'text')):
+        last_pk = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            SearchTerm.objects.bulk_create(
+                [term for post in batch for term in _terms(post)],
+                batch_size=BATCH_SIZE,
+            )
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+    return indexed
+
+
+def query_tokens(query):
+    return list(tokenize(query))[:MAX_QUERY_TOKENS]
+
+
+def idf(tokens):
+    """Веса слов запроса в порядке tokens.
+
+    None, если запрос пуст или какого-то слова нет в индексе.
+    """
+    frequencies = dict(
+        SearchTerm.objects.filter(token__in=tokens).order_by()
+        .values_list('token').annotate(Count('pk'))
+    )
+    if not tokens or len(frequencies) < len(tokens):
+        return None
+    total = cached_count(shards.scatter(Post.objects.all()))
+    return tuple(
+        math.log(1 + total / frequencies[token]) for token in tokens
+    )
+
+
+def ranked(query, weights=None):
+    """Посты, содержащие все слова запроса, с оценкой tf-idf.
+
+    Возвращает строки (post_id, score) по убыванию оценки; читаются
+    только записи индекса для слов запроса, а не вся таблица постов.
+    weights — веса слов из idf(); их передают, чтобы оценки совпадали
+    с оценками уже выданных страниц.
+    """
+    tokens = query_tokens(query)
+    terms = SearchTerm.objects.filter(token__in=tokens)
+    if weights is None:
+        weights = idf(tokens)
+    if weights is None:
+        return terms.none().values('post_id').annotate(
+            score=Sum('weight', output_field=FloatField())
+        ).order_by('-score', '-post_id')
+    score = Sum(Case(
+        *(
+            When(token=token, then=ExpressionWrapper(
+                F('weight') * weight, output_field=FloatField(),
+            ))
+            for token, weight in zip(tokens, weights)
+        ),
+        output_field=FloatField(),
+    ))
+    return terms.order_by().values('post_id').annotate(
+        matches=Count('pk'), score=score,
+    ).filter(matches=len(tokens)).order_by('-score', '-post_id')
+
+
+def decode_cursor(token):
+    """(оценка, id, веса слов) из токена или None, если токен испорчен."""
+    try:
+        raw = urlsafe_base64_decode(token).decode()
+        score, pk, weights = raw.split(CURSOR_SEPARATOR)
+        weights = tuple(float(weight) for weight in weights.split(','))
+        return float(score), int(pk), weights
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+class SearchPaginator(Paginator):
+    """Keyset-пагинация результатов поиска по (оценка, id).
+
+    Курсор хранит и веса слов, с которыми считались оценки первой
+    страницы: новые посты меняют частоты слов и число постов, и без этого
+    оценки следующих страниц не совпали бы с оценкой в курсоре. На
+    странице отдаются посты с атрибутом search_score.
+    """
+    keyset = True
+    decode_cursor = staticmethod(decode_cursor)
+
+    def __init__(self, query, per_page, **kwargs):
+        self.query = query
+        self.tokens = query_tokens(query)
+        self.weights = idf(self.tokens)
+        super().__init__(ranked(query, self.weights), per_page, **kwargs)
+
+    def encode_cursor(self, post):
+        raw = CURSOR_SEPARATOR.join((
+            repr(post.search_score),
+            str(post.pk),
+            ','.join(map(repr, self.weights)),
+        ))
+        return urlsafe_base64_encode(force_bytes(raw))
+
+    def _use_weights(self, weights):
+        if len(weights) != len(self.tokens):
+            return False
+        self.weights = weights
+        self.object_list = ranked(self.query, weights)
+        return True
+
+    def get_cursor_page(self, after=None, before=None):
+        cursor = before or after
+        key = self.decode_cursor(cursor) if cursor else None
+        if key is not None and self._use_weights(key[2]):
+            if before:
+                page = self._page_before(*key[:2])
+                if page.has_previous():
+                    return page
+            else:
+                return self._page_after(*key[:2])
+        return self._page(self.object_list, has_previous=False)
+
+    def _posts(self, rows):
+        posts = shards.in_bulk(
+            shards.with_related(Post.objects.all(), 'author', 'group'),
+            [row['post_id'] for row in rows],
+        )
+        page = []
+        for row in rows:
+            post = posts.get(row['post_id'])
+            if post is not None:
+                post.search_score = row['score']
+                page.append(post)
+        return page
+
+    def _page(self, rows, has_previous):
+        rows = list(rows.order_by('-score', '-post_id')[:self.per_page + 1])
+        return CursorPage(
+            self._posts(rows[:self.per_page]), self,
+            has_next=len(rows) > self.per_page,
+            has_previous=has_previous,
+        )
+
+    def _page_after(self, score, pk):
+        return self._page(
+            self.object_list.filter(
+                Q(score__lt=score) | Q(score=score, post_id__lt=pk)
+            ),
+            has_previous=True,
+        )
+
+    def _page_before(self, score, pk):
+        rows = self.object_list.filter(
+            Q(score__gt=score) | Q(score=score, post_id__gt=pk)
+        ).order_by('score', 'post_id')
+        rows = list(rows[:self.per_page + 1])
+        return CursorPage(
+            self._posts(rows[:self.per_page][::-1]), self,
+            has_next=True,
+            has_previous=len(rows) > self.per_page,
+        )
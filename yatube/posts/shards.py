@@ -0,0 +1,112 @@
+import zlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Comment, Post, ShardSequence
+from .streams import MergedFeed
+
+User = get_user_model()
+
+# id поста и комментария = номер из общей последовательности * SLOTS +
+# индекс шарда, поэтому строка по id читается из одной базы.
+SLOTS = 1024
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def shard_for_author(author_id):
+    shards = settings.POST_SHARDS
+    return shards[zlib.crc32(str(author_id).encode()) % len(shards)]
+
+
+def shard_for_pk(pk):
+    return settings.POST_SHARDS[int(pk) % SLOTS]
+
+
+def allocate_pk(alias):
+    """Новый id для строки в шарде alias из общей последовательности."""
+    sequence = ShardSequence.objects.using(DEFAULT_DB_ALIAS).create()
+    ShardSequence.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=sequence.pk
+    ).delete()
+    return sequence.pk * SLOTS + settings.POST_SHARDS.index(alias)
+
+
+def each(queryset):
+    """Копии queryset для каждого шарда или сам queryset без шардов."""
+    if not enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in settings.POST_SHARDS]
+
+
+def scatter(queryset):
+    """Выборка со всех шардов, слитая в порядке (-pub_date, -pk)."""
+    if not enabled():
+        return queryset
+    return MergedFeed(each(queryset))
+
+
+def by_pk(queryset, pk):
+    """queryset в шарде, где хранится пост или комментарий с этим id."""
+    if not enabled():
+        return queryset
+    try:
+        return queryset.using(shard_for_pk(pk))
+    except (TypeError, ValueError, IndexError):
+        return queryset.none()
+
+
+def in_bulk(queryset, pks):
+    """in_bulk по id, разложенным по шардам."""
+    if not enabled():
+        return queryset.in_bulk(pks)
+    found = {}
+    for posts in each(queryset):
+        found.update(posts.in_bulk(pks))
+    return found
+
+
+def update(queryset, **values):
+    """UPDATE во всех шардах, возвращает общее число строк."""
+    return sum(posts.update(**values) for posts in each(queryset))
+
+
+def with_related(queryset, *fields):
+    """select_related, а при шардировании — prefetch_related.
+
+    Связанные пользователи и группы лежат в default, JOIN с ними внутри
+    шарда невозможен, поэтому они догружаются отдельными запросами.
+    """
+    if enabled():
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+class ShardRouter:
+    """Посты — в шард по хэшу author_id, комментарии — в шард поста.
+
+    Остальные модели остаются в default, ссылки из них на посты база
+    не проверяет. Для запросов без подсказки instance шард неизвестен:
+    их направляют через by_pk, each и scatter.
+    """
+
+    def _shard(self, model, instance):
+        if not enabled() or model not in (Post, Comment):
+            return None
+        if isinstance(instance, Post):
+            return instance._state.db or shard_for_author(instance.author_id)
+        if isinstance(instance, Comment) and instance.post_id is not None:
+            return shard_for_pk(instance.post_id)
+        if isinstance(instance, User) and model is Post:
+            return shard_for_author(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
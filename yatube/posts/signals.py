@@ -0,0 +1,196 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import thumbnails
+from . import autocomplete, counters, media, search, shards, timeline
+from .caching import bump_content_version_on_commit
+from .models import ArchivedPost, Comment, Follow, Group, Post, SearchTerm
+
+User = get_user_model()
+
+
+@receiver(connection_created)
+def disable_foreign_keys_for_shards(sender, connection, **kwargs):
+    # Посты в шардах ссылаются на пользователей из default, а индекс
+    # поиска в default — на посты в шардах: такие ссылки база не проверит.
+    if shards.enabled() and connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys = OFF')
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_shard_pk(sender, instance, using, **kwargs):
+    if shards.enabled() and instance._state.adding and instance.pk is None:
+        instance.pk = shards.allocate_pk(using)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, using, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = None
+    instance._saved_text = None
+    if instance.pk is not None:
+        (
+            instance._saved_group_id,
+            instance._saved_image,
+            instance._saved_text,
+        ) = Post.objects.using(using).filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first() or (None, None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    bump_content_version_on_commit()
+    if created:
+        counters.change_posts(instance.author_id, 1)
+        counters.change_group_posts(instance.group_id, 1)
+        timeline.push_post(instance)
+    elif instance._saved_group_id != instance.group_id:
+        counters.change_group_posts(instance._saved_group_id, -1)
+        counters.change_group_posts(instance.group_id, 1)
+    if instance.text != instance._saved_text:
+        search.index_post(instance)
+    image = instance.image.name or ''
+    if image != (instance._saved_image or ''):
+        counters.change_media_refs(image, 1)
+        release_media(instance._saved_image)
+        if image:
+            transaction.on_commit(lambda: thumbnails.enqueue(image))
+
+
+def touch_posts(**lookup):
+    """Помечает изменёнными карточки постов, в том числе архивных."""
+    now = timezone.now()
+    shards.update(Post.objects.filter(**lookup), updated=now)
+    ArchivedPost.objects.filter(**lookup).update(updated=now)
+
+
+def release_media(name):
+    if counters.change_media_refs(name, -1) == 0:
+        transaction.on_commit(lambda: media.release(name))
+
+
+@receiver(thumbnails.thumbnails_ready)
+def post_thumbnails_ready(sender, name, **kwargs):
+    # Карточки с заглушкой вместо картинки нужно пересобрать.
+    touch_posts(image=name)
+    bump_content_version_on_commit()
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_content_version_on_commit()
+    counters.change_posts(instance.author_id, -1)
+    counters.change_group_posts(instance.group_id, -1)
+    release_media(instance.image.name)
+    if instance._state.db != DEFAULT_DB_ALIAS:
+        # Каскадное удаление в шарде не доходит до индекса в default.
+        SearchTerm.objects.filter(post_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def archived_post_deleted(sender, instance, **kwargs):
+    bump_content_version_on_commit()
+    counters.change_posts(instance.author_id, -1)
+    counters.change_archived(instance.author_id, -1)
+    counters.change_group_posts(instance.group_id, -1)
+    release_media(instance.image.name)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Карточки постов выводят slug группы: помечаем их изменёнными.
+    touch_posts(group=instance)
+    bump_content_version_on_commit()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    if not created:
+        touch_posts(author=instance)
+    bump_content_version_on_commit()
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_posts(sender, instance, **kwargs):
+    # Каскад Django удаляет связанные строки только в базе пользователя,
+    # посты и комментарии в шардах удаляются здесь, с их сигналами.
+    if not shards.enabled():
+        return
+    for comments in shards.each(Comment.objects.filter(author=instance)):
+        comments.delete()
+    for posts in shards.each(Post.objects.filter(author=instance)):
+        posts.delete()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    bump_content_version_on_commit()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    bump_content_version_on_commit()
+    if created:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump_content_version_on_commit()
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        followers = counters.change_followers(instance.author_id, 1)
+        counters.change_following(instance.user_id, 1)
+        if followers >= settings.FEED_PULL_THRESHOLD:
+            timeline.pull_author(instance.author_id)
+        timeline.add_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_followers(instance.author_id, -1)
+    counters.change_following(instance.user_id, -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def autocomplete_user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    entry = autocomplete.user_entry(instance)
+    transaction.on_commit(lambda: autocomplete.index.put(entry))
+
+
+@receiver(post_delete, sender=User)
+def autocomplete_user_deleted(sender, instance, **kwargs):
+    owner = ('user', instance.pk)
+    transaction.on_commit(lambda: autocomplete.index.discard(owner))
+
+
+@receiver(post_save, sender=Group)
+def autocomplete_group_saved(sender, instance, **kwargs):
+    entry = autocomplete.group_entry(instance)
+    transaction.on_commit(lambda: autocomplete.index.put(entry))
+
+
+@receiver(post_delete, sender=Group)
+def autocomplete_group_deleted(sender, instance, **kwargs):
+    owner = ('group', instance.pk)
+    transaction.on_commit(lambda: autocomplete.index.discard(owner))
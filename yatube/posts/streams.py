@@ -0,0 +1,60 @@
+import heapq
+from itertools import islice
+
+DEFAULT_ORDERING = ('-pub_date', '-pk')
+
+
+class MergedFeed:
+    """K-way слияние нескольких отсортированных выборок постов.
+
+    Ведёт себя для пагинаторов как QuerySet: умеет filter, order_by,
+    count и срезы. Для среза [start:stop] из каждого источника читается
+    не больше stop строк, поэтому чтение ограничено размером страницы.
+    """
+    ordered = True
+
+    def __init__(self, streams, ordering=DEFAULT_ORDERING):
+        self.ordering = tuple(ordering)
+        self.streams = [stream.order_by(*self.ordering) for stream in streams]
+
+    def _key(self, obj):
+        return tuple(
+            getattr(obj, field.lstrip('-')) for field in self.ordering
+        )
+
+    def _merge(self, streams):
+        return heapq.merge(
+            *streams,
+            key=self._key,
+            reverse=self.ordering[0].startswith('-'),
+        )
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            [stream.filter(*args, **kwargs) for stream in self.streams],
+            self.ordering,
+        )
+
+    def order_by(self, *ordering):
+        return MergedFeed(self.streams, ordering)
+
+    def count(self):
+        return sum(stream.count() for stream in self.streams)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return self._merge(self.streams)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None:
+                raise ValueError('MergedFeed не поддерживает шаг среза.')
+            start = index.start or 0
+            stop = index.stop
+            streams = self.streams
+            if stop is not None:
+                streams = [stream[:stop] for stream in streams]
+            return list(islice(self._merge(streams), start, stop))
+        return self[index:index + 1][0]
@@ -0,0 +1,149 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..counters import reconcile
+from ..models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post, SearchTerm,
+    TimelineEntry,
+)
+from ..search import ranked
+
+User = get_user_model()
+
+ARCHIVE_TABLES = (ArchivedPost._meta.db_table, ArchivedComment._meta.db_table)
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.old = [
+            self.create_post(f'Старый {number}', days=400 + number)
+            for number in range(5)
+        ]
+        self.fresh = self.create_post('Свежий', days=1)
+        self.comment = Comment.objects.create(
+            post=self.old[0], author=self.reader, text='Комментарий'
+        )
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def create_post(self, text, days):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text=text
+        )
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - timedelta(days=days)
+        )
+        post.refresh_from_db()
+        return post
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_posts', stdout=out, **options)
+        return out.getvalue()
+
+    def test_old_posts_moved_in_batches(self):
+        """Старые посты с комментариями переносятся пачками."""
+        output = self.archive(batch_size=2)
+        self.assertIn('постов: 5, пачек: 3', output)
+        self.assertEqual(list(Post.objects.all()), [self.fresh])
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('pk', flat=True)),
+            {post.pk for post in self.old},
+        )
+        archived = ArchivedComment.objects.get()
+        self.assertEqual(archived.pk, self.comment.pk)
+        self.assertEqual(archived.post_id, self.old[0].pk)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            ArchivedPost.objects.get(pk=self.old[0].pk).comments_count, 1
+        )
+
+    def test_counters_survive_archive(self):
+        """Счётчики постов учитывают архив, сверка ничего не правит."""
+        self.archive()
+        self.author.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 6)
+        self.assertEqual(self.author.stats.archived_count, 5)
+        self.assertEqual(self.group.posts_count, 6)
+        self.assertFalse(any(reconcile().values()))
+
+    def test_archived_post_detail(self):
+        """Страница архивного поста открывается с комментариями."""
+        self.archive()
+        post = self.old[0]
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertTrue(response.context['archived'])
+        self.assertEqual(response.context['post'].text, post.text)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [self.comment.text],
+        )
+        self.assertNotContains(
+            response, reverse('posts:add_comment', args=(post.pk,))
+        )
+
+    def test_profile_merges_archive(self):
+        """Профиль выводит свежие и архивные посты по дате."""
+        self.archive()
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 6)
+        self.assertEqual(
+            [post.pk for post in page_obj],
+            [post.pk for post in [self.fresh, *self.old]],
+        )
+
+    def test_hot_pages_skip_archive(self):
+        """Главная, группа, лента и поиск не читают архивные таблицы."""
+        self.archive()
+        self.assertFalse(
+            TimelineEntry.objects.filter(post_id=self.old[0].pk).exists()
+        )
+        self.assertFalse(
+            SearchTerm.objects.filter(post_id=self.old[0].pk).exists()
+        )
+        self.assertEqual(len(ranked('старый')), 0)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(
+                    list(response.context['page_obj']), [self.fresh]
+                )
+                for query in queries:
+                    for table in ARCHIVE_TABLES:
+                        self.assertNotIn(table, query['sql'])
+
+    def test_deleting_author_releases_archive(self):
+        """Удаление автора удаляет и его архивные посты."""
+        self.archive()
+        self.author.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertFalse(ArchivedPost.objects.exists())
@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from ..autocomplete import VERSION_KEY, PrefixIndex, index
+from ..models import Group
+
+User = get_user_model()
+
+
+class AutocompleteTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Alice')
+        self.group = Group.objects.create(
+            title='Алгоритмы', slug='algo', description='Описание'
+        )
+
+    def labels(self, prefix):
+        return [result['label'] for result in index.lookup(prefix)]
+
+    def test_prefix_matches_users_and_groups(self):
+        """По префиксу находятся пользователи и группы без учёта регистра."""
+        self.assertEqual(self.labels('AL'), ['Алгоритмы', 'Alice'])
+        self.assertEqual(self.labels('алг'), ['Алгоритмы'])
+        self.assertEqual(self.labels('x'), [])
+
+    def test_index_follows_changes(self):
+        """Переименование и удаление сразу видны в подсказках."""
+        self.labels('a')
+        self.user.username = 'Bob'
+        self.user.save()
+        self.group.delete()
+        self.assertEqual(self.labels('al'), [])
+        self.assertEqual(self.labels('b'), ['Bob'])
+
+    def test_reload_after_change_in_other_process(self):
+        """Смена версии в общем кэше перестраивает индекс процесса."""
+        self.labels('a')
+        User.objects.filter(pk=self.user.pk).update(username='Carol')
+        self.assertEqual(self.labels('c'), [])
+        cache.incr(VERSION_KEY)
+        self.assertEqual(self.labels('c'), ['Carol'])
+
+    def test_other_process_applies_changes_without_reload(self):
+        """Другой процесс применяет изменения из кэша, не читая таблицы."""
+        other = PrefixIndex()
+        other.lookup('a')
+        User.objects.create_user(username='Dave')
+        self.group.delete()
+        with self.assertNumQueries(0):
+            labels = [result['label'] for result in other.lookup('d')]
+            self.assertEqual(other.lookup('алг'), [])
+        self.assertEqual(labels, ['Dave'])
+
+    def test_endpoint_does_not_query_database(self):
+        """Эндпоинт отвечает JSON из памяти без запросов к базе."""
+        client = Client()
+        url = reverse('posts:autocomplete')
+        client.get(url, {'q': 'a'})
+        with self.assertNumQueries(0):
+            response = client.get(url, {'q': 'ali'})
+        self.assertEqual(response.json(), {'results': [{
+            'type': 'user',
+            'label': 'Alice',
+            'url': reverse('posts:profile', args=('Alice',)),
+        }]})
@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('Author')
+        self.reader = User.objects.create_user('Reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cats',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='dogs',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста двигают счётчики."""
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+        self.post.group = self.other_group
+        self.post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        self.post.delete()
+        self.author.stats.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки двигают счётчики."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+
+        comment.delete()
+        Follow.objects.all().delete()
+        self.post.refresh_from_db()
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        """Команда reconcile_counters исправляет разошедшиеся счётчики."""
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=5)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=3)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.author.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+
+    def test_pages_show_counter(self):
+        """post_detail и profile выводят счётчик постов автора."""
+        client = Client()
+        response = client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, '<span >1</span>')
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': self.author})
+        )
+        self.assertContains(response, 'Всего постов: 1')
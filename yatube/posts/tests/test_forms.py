@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -7,6 +8,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from http import HTTPStatus
+from PIL import Image
 
 from ..models import Group, Post, Comment
 
@@ -14,9 +16,12 @@ User = get_user_model()
 ONE_POST = 1
 ONE_COMMENT = 1
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+HASHED_IMAGE = (
+    r'^posts/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.{extension}$'
+)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostFormCreateEditTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -78,10 +83,36 @@ class PostFormCreateEditTests(TestCase):
                 author=self.user,
                 text=post_content['text'],
                 group=None,
-                image='posts/small.gif'
+                image__regex=HASHED_IMAGE.format(extension='gif'),
             ).exists()
         )
 
+    @override_settings(IMAGE_MAX_SIZE=100)
+    def test_uploaded_image_normalized(self):
+        """Картинка повёрнута по EXIF, без метаданных и не больше лимита."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        uploaded = SimpleUploadedFile(
+            name='photo.jpg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый пост', 'image': uploaded},
+        )
+        post = Post.objects.get(
+            image__regex=HASHED_IMAGE.format(extension='jpg')
+        )
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertNotIn('exif', image.info)
+
     def test_post_create_with_group(self):
         """Проверка создания поста с группой."""
         post_content = {
@@ -0,0 +1,154 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default as sorl_default
+
+from core import thumbnails
+
+from ..counters import reconcile
+from ..models import MediaFile, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+@mock.patch('core.thumbnails.enqueue')
+class MediaRefsTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+
+    def create_post(self, content=b'meme'):
+        name = default_storage.save('posts/meme.jpg', ContentFile(content))
+        return Post.objects.create(author=self.user, text='Текст', image=name)
+
+    def refs(self, post):
+        return MediaFile.objects.get(name=post.image.name).refs
+
+    def test_identical_uploads_share_file(self, enqueue):
+        """Одинаковые картинки ссылаются на один файл со счётчиком."""
+        first = self.create_post()
+        second = self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(first), 2)
+
+    def test_file_deleted_with_last_reference(self, enqueue):
+        """Файл удаляется, когда на него не осталось ссылок."""
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        first.delete()
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_replaced_image_released(self, enqueue):
+        """При замене картинки старый файл освобождается."""
+        post = self.create_post()
+        old = post.image.name
+        post.image = default_storage.save(
+            'posts/other.jpg', ContentFile(b'other')
+        )
+        post.save()
+        self.assertFalse(default_storage.exists(old))
+        self.assertEqual(self.refs(post), 1)
+
+    def test_reconcile_restores_refs(self, enqueue):
+        """reconcile исправляет разошедшийся счётчик ссылок."""
+        post = self.create_post()
+        MediaFile.objects.all().delete()
+        self.assertEqual(reconcile()['media'], 1)
+        self.assertEqual(self.refs(post), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class CollectMediaGarbageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails.backend.ready.clear()
+        user = User.objects.create_user(username='author')
+        buffer = BytesIO()
+        Image.new('RGB', (20, 10), 'red').save(buffer, 'JPEG')
+        self.kept = Post.objects.create(
+            author=user,
+            text='Текст',
+            image=default_storage.save(
+                'posts/kept.jpg', ContentFile(buffer.getvalue())
+            ),
+        )
+        thumbnails.generate(self.kept.image.name)
+        self.orphan = default_storage.save(
+            'posts/orphan.jpg', ContentFile(b'orphan')
+        )
+        self.thumbnail = sorl_default.storage.save(
+            'cache/00/00/orphan.jpg', ContentFile(b'thumbnail')
+        )
+
+    def collect(self, **options):
+        out = StringIO()
+        call_command(
+            'collect_media_garbage', batch_size=2, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_orphans_deleted_referenced_kept(self):
+        """Удаляются только файлы без ссылок, миниатюры постов остаются."""
+        output = self.collect(grace=0)
+        self.assertIn('удалено: 2', output)
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertFalse(sorl_default.storage.exists(self.thumbnail))
+        self.assertTrue(default_storage.exists(self.kept.image.name))
+        geometry, options = settings.THUMBNAIL_PRESETS[0]
+        thumbnail = thumbnails.backend.get_ready_thumbnail(
+            self.kept.image, geometry, **options
+        )
+        self.assertTrue(thumbnail.exists())
+
+    def test_fresh_files_kept(self):
+        """Файлы моложе grace не трогаются."""
+        self.assertIn('удалено: 0', self.collect())
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_dry_run(self):
+        """--dry-run только перечисляет сирот."""
+        output = self.collect(grace=0, dry_run=True)
+        self.assertIn(self.orphan, output)
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_reuploaded_file_kept(self):
+        """Файл, на который снова появилась ссылка, не удаляется."""
+        MediaFile.objects.create(name=self.orphan, refs=1)
+        self.assertIn('удалено: 1', self.collect(grace=0))
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_incremental_runs_resume(self):
+        """С --limit и --checkpoint сбор идёт частями до конца дерева."""
+        checkpoint = Path(TEMP_MEDIA_ROOT) / 'checkpoint'
+        self.collect(grace=0, limit=1, checkpoint=checkpoint)
+        self.assertTrue(checkpoint.exists())
+        while checkpoint.exists():
+            self.collect(grace=0, limit=1, checkpoint=checkpoint)
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertFalse(sorl_default.storage.exists(self.thumbnail))
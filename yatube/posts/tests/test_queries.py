@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..timeline import rebuild
+from .utils import QueryBudgetTestCase
+
+User = get_user_model()
+
+LIST_BUDGET = 3
+AUTHORIZED_LIST_BUDGET = 6
+DETAIL_BUDGET = 2
+
+
+class PostsQueryBudgetTest(QueryBudgetTestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader = User.objects.create_user('Reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cats',
+            description='Тестовое описание',
+        )
+        self.authors = [
+            User.objects.create_user(f'Author{number}') for number in range(5)
+        ]
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        self.post = Post.objects.create(
+            text='Пост с комментариями',
+            author=self.authors[0],
+            group=self.group,
+        )
+
+    def fill_posts(self, rows):
+        missing = rows - Post.objects.count()
+        Post.objects.bulk_create(
+            Post(
+                text=f'Пост {number}',
+                author=self.authors[number % len(self.authors)],
+                group=self.group,
+            )
+            for number in range(missing)
+        )
+
+    def fill_timeline(self, rows):
+        self.fill_posts(rows)
+        rebuild(self.reader.pk)
+
+    def fill_comments(self, rows):
+        missing = rows - Comment.objects.count()
+        Comment.objects.bulk_create(
+            Comment(
+                text=f'Комментарий {number}',
+                post=self.post,
+                author=self.authors[number % len(self.authors)],
+            )
+            for number in range(missing)
+        )
+
+    def test_index_budget(self):
+        self.assertBudgetForRowCounts(
+            self.fill_posts, self.guest_client,
+            reverse('posts:index'), LIST_BUDGET,
+        )
+
+    def test_group_posts_budget(self):
+        self.assertBudgetForRowCounts(
+            self.fill_posts, self.guest_client,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            LIST_BUDGET,
+        )
+
+    def test_profile_budget(self):
+        self.assertBudgetForRowCounts(
+            self.fill_posts, self.guest_client,
+            reverse('posts:profile', kwargs={'username': self.authors[0]}),
+            LIST_BUDGET,
+        )
+
+    def test_follow_index_budget(self):
+        self.assertBudgetForRowCounts(
+            self.fill_timeline, self.reader_client,
+            reverse('posts:follow_index'), AUTHORIZED_LIST_BUDGET,
+        )
+
+    def test_post_detail_budget(self):
+        self.assertBudgetForRowCounts(
+            self.fill_comments, self.guest_client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            DETAIL_BUDGET,
+        )
@@ -0,0 +1,115 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Timeline
+from ..timeline import rebuild
+
+User = get_user_model()
+
+FULL_SCAN_RE = re.compile(r'\bSCAN (?:TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTest(TestCase):
+    """Каждый запрос страниц постов идёт по индексу и без сортировки.
+
+    Для всех SELECT, выполненных при открытии страницы, снимается
+    EXPLAIN QUERY PLAN: полный проход таблицы или временное B-дерево
+    для ORDER BY означают, что для запроса не хватает индекса.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.authors[number % len(cls.authors)],
+                group=cls.group if number % 2 else None,
+                text=f'Пост {number}',
+            )
+            for number in range(12)
+        ]
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f'Ответ {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlans(self, url, data=None, allow_sort=False):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.plan(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN_RE.search(step))
+                    if not allow_sort:
+                        self.assertNotIn(TEMP_SORT, step)
+
+    def test_list_pages(self):
+        """Главная, группа и профиль читаются по индексам."""
+        for keyset in (False, True):
+            with self.subTest(keyset=keyset), override_settings(
+                KEYSET_PAGINATION=keyset
+            ):
+                self.assertIndexedPlans(reverse('posts:index'))
+                self.assertIndexedPlans(
+                    reverse('posts:group_list', args=(self.group.slug,))
+                )
+                self.assertIndexedPlans(
+                    reverse('posts:profile', args=(self.authors[0],))
+                )
+                self.assertIndexedPlans(
+                    reverse('posts:index'), {'page': 2}
+                )
+
+    def test_post_detail(self):
+        """Пост и его комментарии читаются по индексам."""
+        self.assertIndexedPlans(
+            reverse('posts:post_detail', args=(self.posts[0].pk,))
+        )
+
+    def test_follow_index(self):
+        """Лента подписок без полных проходов — до и после материализации.
+
+        Пока лента не готова, JOIN сливает посты многих авторов
+        и сортировка неизбежна. Готовая лента листается по индексу
+        записей ленты без сортировки.
+        """
+        url = reverse('posts:follow_index')
+        Timeline.objects.filter(user=self.reader).update(ready=False)
+        self.assertIndexedPlans(url, allow_sort=True)
+        rebuild(self.reader.pk)
+        for keyset in (False, True):
+            with self.subTest(keyset=keyset), override_settings(
+                KEYSET_PAGINATION=keyset
+            ):
+                self.assertIndexedPlans(url)
+                self.assertIndexedPlans(url, {'page': 2})
@@ -0,0 +1,138 @@
+import warnings
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, SearchTerm
+from ..search import SearchPaginator, ranked, tokenize
+
+User = get_user_model()
+
+
+class TokenizeTest(TestCase):
+    def test_tokenize(self):
+        """Слова приводятся к нижнему регистру, короткие отбрасываются."""
+        self.assertEqual(
+            tokenize('Ёжик в тумане, ёжик 3!'),
+            {'ежик': 2, 'тумане': 1, '3': 1},
+        )
+
+
+class SearchIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+
+    def tokens(self, post):
+        return set(
+            SearchTerm.objects.filter(post=post).values_list(
+                'token', flat=True
+            )
+        )
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        self.assertEqual(self.tokens(post), {'старый', 'текст'})
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.tokens(post), {'новый', 'текст'})
+        post.delete()
+        self.assertFalse(SearchTerm.objects.exists())
+
+    def test_all_words_required_and_ranked(self):
+        """Найдены посты со всеми словами, частые совпадения выше."""
+        once = Post.objects.create(author=self.user, text='кот и пёс')
+        twice = Post.objects.create(author=self.user, text='кот кот пёс')
+        Post.objects.create(author=self.user, text='только кот')
+        page = SearchPaginator('Кот пёс', 10).get_cursor_page()
+        self.assertEqual(list(page), [twice, once])
+        self.assertFalse(ranked('кот жираф').exists())
+
+    def test_rebuild_command(self):
+        """rebuild_search_index индексирует посты, созданные без сигналов."""
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='массовая загрузка')]
+        )
+        self.assertFalse(ranked('массовая').exists())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertTrue(ranked('массовая').exists())
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'поиск номер {i}')
+            for i in range(13)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_pages_cover_all_results_once(self):
+        """Курсоры проходят все результаты без повторов и пропусков."""
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'поиск'})
+        self.assertEqual(response.context['query'], 'поиск')
+        page = response.context['page_obj']
+        seen = list(page)
+        self.assertContains(response, '?q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA&')
+        response = self.client.get(
+            url, {'q': 'поиск', 'after': page.next_cursor}
+        )
+        second = response.context['page_obj']
+        seen += list(second)
+        self.assertFalse(second.has_next())
+        self.assertCountEqual(seen, self.posts)
+        response = self.client.get(
+            url, {'q': 'поиск', 'before': second.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), list(page))
+
+    def test_cursor_survives_new_posts(self):
+        """Новые посты не сдвигают оценки на следующих страницах."""
+        url = reverse('posts:search')
+        page = self.client.get(url, {'q': 'поиск номер'}).context['page_obj']
+        Post.objects.create(author=self.user, text='поиск поиск поиск')
+        Post.objects.create(author=self.user, text='другой текст')
+        cache.clear()
+        response = self.client.get(
+            url, {'q': 'поиск номер', 'after': page.next_cursor}
+        )
+        self.assertCountEqual(
+            list(page) + list(response.context['page_obj']), self.posts
+        )
+
+    def test_results_are_ordered(self):
+        """Результаты поиска упорядочены, пагинатор не предупреждает."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            SearchPaginator('поиск', 10)
+        self.assertTrue(ranked('поиск').ordered)
+
+    def test_nothing_found(self):
+        """Пустой результат выводит сообщение."""
+        response = self.client.get(reverse('posts:search'), {'q': 'нет'})
+        self.assertContains(response, 'ничего не найдено')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты по индексу."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'номер 3'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.posts[3]]
+        )
@@ -0,0 +1,242 @@
+import os
+import tempfile
+from contextlib import ExitStack
+from io import StringIO
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import shards
+from ..models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post
+)
+
+User = get_user_model()
+
+SHARDS = ['shard0', 'shard1']
+
+
+class ShardedPostsTest(TransactionTestCase):
+    """Шарды — отдельные файлы SQLite с применёнными миграциями."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for alias in SHARDS:
+            connections.databases[alias] = dict(
+                connections.databases[DEFAULT_DB_ALIAS],
+                NAME=os.path.join(directory.name, f'{alias}.sqlite3'),
+            )
+            self.addCleanup(self.drop_shard, alias)
+        settings = override_settings(POST_SHARDS=SHARDS)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for alias in SHARDS:
+            call_command('migrate', database=alias, verbosity=0)
+            # Миграции снова включают проверку внешних ключей.
+            connections[alias].close()
+        # Соединение с default открыто до включения шардов.
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys = OFF')
+        self.addCleanup(self.enable_foreign_keys)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.authors = self.authors_on_each_shard()
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def drop_shard(self, alias):
+        connections[alias].close()
+        delattr(connections._connections, alias)
+        del connections.databases[alias]
+
+    def enable_foreign_keys(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_keys = ON')
+
+    def authors_on_each_shard(self):
+        authors = {}
+        for number in count():
+            user = User.objects.create_user(username=f'author{number}')
+            authors.setdefault(shards.shard_for_author(user.pk), user)
+            if len(authors) == len(SHARDS):
+                return [authors[alias] for alias in SHARDS]
+
+    def create_posts(self, total):
+        return [
+            Post.objects.create(
+                author=self.authors[number % len(self.authors)],
+                group=self.group,
+                text=f'Пост {number}',
+            )
+            for number in range(total)
+        ]
+
+    def test_post_stored_in_author_shard(self):
+        """Пост лежит только в шарде автора, шард зашит в id."""
+        for alias, author in zip(SHARDS, self.authors):
+            post = Post.objects.create(author=author, text='Текст')
+            self.assertEqual(post._state.db, alias)
+            self.assertEqual(shards.shard_for_pk(post.pk), alias)
+            for other in [DEFAULT_DB_ALIAS, *SHARDS]:
+                self.assertEqual(
+                    Post.objects.using(other).filter(pk=post.pk).exists(),
+                    other == alias,
+                )
+
+    def assertReadsOnlyShard(self, alias, url):
+        with ExitStack() as stack:
+            contexts = {
+                other: stack.enter_context(
+                    CaptureQueriesContext(connections[other])
+                )
+                for other in SHARDS
+            }
+            response = self.client.get(url)
+        for other, context in contexts.items():
+            self.assertEqual(bool(len(context)), other == alias, other)
+        return response
+
+    def test_profile_reads_one_shard(self):
+        """Профиль читает только шард автора."""
+        posts = self.create_posts(4)
+        author = self.authors[1]
+        response = self.assertReadsOnlyShard(
+            SHARDS[1], reverse('posts:profile', args=(author.username,))
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [post for post in reversed(posts) if post.author == author],
+        )
+
+    def test_comments_live_with_post(self):
+        """Комментарий сохраняется в шарде поста и виден на его странице."""
+        post = Post.objects.create(author=self.authors[1], text='Текст')
+        self.client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        comment = Comment.objects.using(SHARDS[1]).get()
+        self.assertEqual(comment.author, self.reader)
+        self.assertEqual(shards.shard_for_pk(comment.pk), SHARDS[1])
+        response = self.assertReadsOnlyShard(
+            SHARDS[1], reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertEqual(list(response.context['comments']), [comment])
+        self.assertEqual(response.context['post'].comments_count, 1)
+
+    def test_lists_merge_shards(self):
+        """Главная, группа и лента подписок сливают шарды по дате."""
+        posts = self.create_posts(13)
+        for author in self.authors:
+            Follow.objects.create(user=self.reader, author=author)
+        expected = list(reversed(posts))
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                second = self.client.get(url, {'page': 2}).context['page_obj']
+                self.assertEqual(first.paginator.count, len(posts))
+                self.assertEqual(list(first) + list(second), expected)
+
+    def test_post_create_and_search(self):
+        """Пост из формы попадает в шард автора и находится поиском."""
+        author = self.authors[0]
+        client = Client()
+        client.force_login(author)
+        client.post(reverse('posts:post_create'), {'text': 'Шардированный'})
+        post = Post.objects.using(SHARDS[0]).get()
+        response = client.get(reverse('posts:search'), {'q': 'шардированный'})
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_archive_moves_posts_out_of_shards(self):
+        """Архив собирает посты и комментарии всех шардов в default."""
+        posts = self.create_posts(4)
+        Comment.objects.create(
+            post=posts[1], author=self.reader, text='Комментарий'
+        )
+        call_command('archive_posts', days=-1, stdout=StringIO())
+        for alias in SHARDS:
+            self.assertFalse(Post.objects.using(alias).exists())
+            self.assertFalse(Comment.objects.using(alias).exists())
+        self.assertEqual(ArchivedPost.objects.count(), len(posts))
+        self.assertEqual(ArchivedComment.objects.get().post_id, posts[1].pk)
+        author = self.authors[1]
+        response = self.client.get(
+            reverse('posts:profile', args=(author.username,))
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in reversed(posts) if post.author == author],
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=(posts[1].pk,))
+        )
+        self.assertEqual(len(response.context['comments']), 1)
+
+    def test_deleting_author_cleans_shards(self):
+        """Удаление автора удаляет его посты и комментарии в шардах."""
+        author = self.authors[1]
+        post = Post.objects.create(author=author, text='Текст')
+        Comment.objects.create(post=post, author=author, text='Свой')
+        other = Post.objects.create(author=self.authors[0], text='Чужой')
+        Comment.objects.create(post=other, author=author, text='Ответ')
+        author.delete()
+        for alias in SHARDS:
+            self.assertFalse(
+                Post.objects.using(alias).filter(author=author).exists()
+            )
+            self.assertFalse(
+                Comment.objects.using(alias).filter(author=author).exists()
+            )
+        other = Post.objects.using(SHARDS[0]).get()
+        self.assertEqual(other.comments_count, 0)
+
+    def test_shard_posts_moves_legacy_posts(self):
+        """shard_posts переносит посты из default в шарды авторов."""
+        with override_settings(POST_SHARDS=[]):
+            legacy = self.create_posts(4)
+            Comment.objects.create(
+                post=legacy[1], author=self.reader, text='Старый ответ'
+            )
+        totals = [author.stats.posts_count for author in self.authors]
+        call_command('shard_posts', *SHARDS, stdout=StringIO())
+        self.assertFalse(Post.objects.using(DEFAULT_DB_ALIAS).exists())
+        self.assertFalse(Comment.objects.using(DEFAULT_DB_ALIAS).exists())
+        moved = shards.scatter(Post.objects.all())
+        self.assertEqual(
+            [(post.text, post.pub_date) for post in moved],
+            [(post.text, post.pub_date) for post in reversed(legacy)],
+        )
+        for post in moved:
+            self.assertEqual(
+                post._state.db, shards.shard_for_author(post.author_id)
+            )
+        for author, total in zip(self.authors, totals):
+            author.stats.refresh_from_db()
+            self.assertEqual(author.stats.posts_count, total)
+        post = next(post for post in moved if post.text == legacy[1].text)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Старый ответ'],
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(
+            len(response.context['page_obj'].object_list), len(legacy)
+        )
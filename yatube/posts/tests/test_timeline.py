@@ -0,0 +1,185 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, Timeline, TimelineEntry, UserStats
+from ..streams import MergedFeed
+from ..timeline import feed_for
+from ..views import VARIABLE_NUM_POSTS
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user('Reader')
+        self.author = User.objects.create_user('Author')
+        self.other_author = User.objects.create_user('OtherAuthor')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_first_follow_makes_timeline_ready(self):
+        """Первая подписка сразу даёт готовую ленту с постами автора."""
+        old_post = Post.objects.create(text='Старый пост', author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        self.assertTrue(Timeline.objects.get(user=self.reader).ready)
+        self.assertEqual(list(feed_for(self.reader)), [old_post])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        post = Post.objects.get(text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other_author)
+        Post.objects.create(text='Пост автора', author=self.author)
+        kept = Post.objects.create(
+            text='Другой пост', author=self.other_author
+        )
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertEqual(list(feed_for(self.reader)), [kept])
+
+    def test_not_ready_timeline_falls_back_to_join(self):
+        """Пока лента не готова, посты берутся через join по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост автора', author=self.author)
+        Timeline.objects.filter(user=self.reader).update(ready=False)
+        TimelineEntry.objects.all().delete()
+        self.assertEqual(list(feed_for(self.reader)), [post])
+
+    def test_backfill_command_fills_timelines(self):
+        """Команда backfill_timelines заполняет ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other_author)
+        posts = [
+            Post.objects.create(text='Пост автора', author=self.author),
+            Post.objects.create(text='Другой пост', author=self.other_author),
+        ]
+        Timeline.objects.all().delete()
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertTrue(Timeline.objects.get(user=self.reader).ready)
+        self.assertEqual(
+            set(feed_for(self.reader)), set(posts)
+        )
+
+
+@override_settings(FEED_PULL_THRESHOLD=2)
+class HybridTimelineTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user('Reader')
+        self.fan = User.objects.create_user('Fan')
+        self.star = User.objects.create_user('Star')
+        self.author = User.objects.create_user('Author')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+
+    def test_followers_are_counted(self):
+        """Счётчик подписчиков следует за созданием и удалением Follow."""
+        self.assertEqual(self.star.stats.followers_count, 2)
+        Follow.objects.filter(user=self.fan).delete()
+        self.star.stats.refresh_from_db()
+        self.assertEqual(self.star.stats.followers_count, 1)
+
+    def test_popular_author_posts_are_pulled(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        star_post = Post.objects.create(text='Пост звезды', author=self.star)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=star_post).exists()
+        )
+        self.assertIsInstance(feed_for(self.reader), MergedFeed)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [star_post])
+
+    def test_merged_feed_is_sorted_and_paginated(self):
+        """Слияние потоков сохраняет порядок по дате на всех страницах."""
+        for number in range(VARIABLE_NUM_POSTS):
+            Post.objects.create(text=f'Звезда {number}', author=self.star)
+            Post.objects.create(text=f'Автор {number}', author=self.author)
+        expected = list(
+            Post.objects.filter(author__in=[self.star, self.author])
+            .order_by('-pub_date', '-pk')
+        )
+        first = self.reader_client.get(reverse('posts:follow_index'))
+        second = self.reader_client.get(
+            reverse('posts:follow_index'), {'page': 2}
+        )
+        self.assertEqual(
+            list(first.context['page_obj']) + list(
+                second.context['page_obj']
+            ),
+            expected,
+        )
+        after = first.context['page_obj'].object_list[-1]
+        self.assertEqual(
+            feed_for(self.reader).filter(pub_date__lt=after.pub_date)[:3],
+            expected[VARIABLE_NUM_POSTS:VARIABLE_NUM_POSTS + 3],
+        )
+
+    def test_unfollow_keeps_author_pulled(self):
+        """Отписка от популярного автора не раскладывает его посты."""
+        star_post = Post.objects.create(text='Пост звезды', author=self.star)
+        Follow.objects.filter(user=self.fan).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=star_post).exists()
+        )
+        self.assertTrue(UserStats.objects.get(user=self.star).pulled)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [star_post])
+
+    def test_backfill_skips_pulled_authors(self):
+        """Пересборка лент не раскладывает посты популярного автора."""
+        star_posts = [
+            Post.objects.create(text=f'Звезда {number}', author=self.star)
+            for number in range(5)
+        ]
+        call_command('backfill_timelines', all=True, stdout=StringIO())
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__in=star_posts).exists()
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), star_posts[::-1]
+        )
+
+    def test_author_below_threshold_is_pushed_by_backfill(self):
+        """Автор, потерявший популярность, раскладывается backfill."""
+        star_post = Post.objects.create(text='Пост звезды', author=self.star)
+        Follow.objects.filter(user=self.fan).delete()
+        out = StringIO()
+        call_command('backfill_timelines', stdout=out)
+        self.assertIn('авторов разложено: 1', out.getvalue())
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=star_post
+            ).exists()
+        )
+        self.assertNotIsInstance(feed_for(self.reader), MergedFeed)
+        self.assertFalse(UserStats.objects.get(user=self.star).pulled)
+        self.assertEqual(
+            UserStats.objects.get(user=self.star).followers_count, 1
+        )
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -5,13 +6,20 @@ from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
+from http import HTTPStatus
 from typing import List
 
+from ..caching import content_version
 from ..forms import CommentForm
 from ..models import Group, Post, Comment, Follow
+from ..paginators import CachedCountPaginator
 from ..views import VARIABLE_NUM_POSTS
 
 User = get_user_model()
@@ -35,7 +43,7 @@ UPLOADED = SimpleUploadedFile(
 )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostTemplateViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -88,7 +96,7 @@ class PostTemplateViewsTests(TestCase):
                 self.assertTemplateUsed(response, template)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
 class PostContextViewsTests(TestCase):
     def setUp(self):
         self.authorized_client = Client()
@@ -375,7 +383,134 @@ class PaginatorTest(TestCase):
         )
 
 
-class PostCacheTest(TestCase):
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='HasNoName')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user)
+            for number in range(TEST_CREATE_NUM_POSTS)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_elided_page_range(self):
+        """Номера страниц сворачиваются вокруг текущей."""
+        paginator = CachedCountPaginator(Post.objects.all(), 1)
+        page = paginator.get_page(7)
+        ellipsis = CachedCountPaginator.ELLIPSIS
+        self.assertEqual(
+            page.elided_page_range,
+            [1, ellipsis, 5, 6, 7, 8, 9, ellipsis, TEST_CREATE_NUM_POSTS],
+        )
+        self.assertEqual(
+            paginator.get_page(1).elided_page_range,
+            [1, 2, 3, ellipsis, TEST_CREATE_NUM_POSTS],
+        )
+
+    def test_count_is_cached(self):
+        """Повторный пагинатор берёт число постов из кэша."""
+        CachedCountPaginator(Post.objects.all(), VARIABLE_NUM_POSTS).count
+        with self.assertNumQueries(0):
+            count = CachedCountPaginator(
+                Post.objects.all(), VARIABLE_NUM_POSTS
+            ).count
+        self.assertEqual(count, TEST_CREATE_NUM_POSTS)
+
+    def test_count_survives_new_post(self):
+        """Новый пост не сбрасывает закэшированное число постов."""
+        CachedCountPaginator(Post.objects.all(), VARIABLE_NUM_POSTS).count
+        Post.objects.create(text='Свежий пост', author=self.user)
+        with self.assertNumQueries(0):
+            count = CachedCountPaginator(
+                Post.objects.all(), VARIABLE_NUM_POSTS
+            ).count
+        self.assertEqual(count, TEST_CREATE_NUM_POSTS)
+
+    def test_stale_count_does_not_hide_new_posts(self):
+        """Устаревший счётчик не прячет свежие посты на странице."""
+        CachedCountPaginator(Post.objects.all(), VARIABLE_NUM_POSTS).count
+        Post.objects.create(text='Свежий пост', author=self.user)
+        page = CachedCountPaginator(
+            Post.objects.all(), VARIABLE_NUM_POSTS
+        ).get_page(2)
+        self.assertEqual(
+            len(page), TEST_CREATE_NUM_POSTS + 1 - VARIABLE_NUM_POSTS
+        )
+
+
+@override_settings(KEYSET_PAGINATION=True)
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.guest_client = Client()
+        cls.user = User.objects.create(username='HasNoName')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.user)
+            for number in range(TEST_CREATE_NUM_POSTS)
+        )
+
+    def test_cursor_pages_cover_all_posts_once(self):
+        """Переход по ?after= проходит ленту целиком без повторов."""
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), VARIABLE_NUM_POSTS)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        cache.clear()
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': first_page.next_cursor}
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(
+            len(second_page), VARIABLE_NUM_POSTS_ON_SECOND_PAGE
+        )
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        seen = [post.pk for post in first_page] + [
+            post.pk for post in second_page
+        ]
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        self.assertEqual(seen, expected)
+
+    def test_cursor_before_returns_previous_page(self):
+        """Ссылка ?before= возвращает предыдущую страницу."""
+        cache.clear()
+        first_page = self.guest_client.get(
+            reverse('posts:index')
+        ).context['page_obj']
+        cache.clear()
+        second_page = self.guest_client.get(
+            reverse('posts:index'), {'after': first_page.next_cursor}
+        ).context['page_obj']
+        cache.clear()
+        previous_page = self.guest_client.get(
+            reverse('posts:index'), {'before': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный токен открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': self.user}),
+            {'after': 'broken'},
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+        self.assertEqual(
+            len(response.context['page_obj']), VARIABLE_NUM_POSTS
+        )
+
+
+class PostCacheTest(TransactionTestCase):
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -387,16 +522,169 @@ class PostCacheTest(TestCase):
         )
 
     def test_cache_index(self):
+        """Фрагмент index живёт в кэше, пока контент не менялся."""
+        cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
         content = response.content
-        Post.objects.all().delete()
-        new_response = self.guest_client.get(reverse('posts:index'))
-        old_content = new_response.content
-        self.assertEqual(content, old_content)
+        Post.objects.update(text='Изменено в обход сигналов')
+        cached_response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(content, cached_response.content)
         cache.clear()
         updated_response = self.guest_client.get(reverse('posts:index'))
-        new_content = updated_response.content
-        self.assertNotEqual(old_content, new_content)
+        self.assertNotEqual(content, updated_response.content)
+
+    def test_cache_index_shared_between_users(self):
+        """Один закэшированный фрагмент index отдаётся всем пользователям."""
+        cache.clear()
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.update(text='Изменено в обход сигналов')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, 'Изменено в обход сигналов')
+
+    def test_cache_index_invalidated_on_change(self):
+        """Создание и удаление поста сразу обновляют фрагмент index."""
+        cache.clear()
+        content = self.guest_client.get(reverse('posts:index')).content
+        new_post = Post.objects.create(text='Новый пост', author=self.user)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(content, response.content)
+        self.assertContains(response, new_post.text)
+        new_post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, new_post.text)
+
+    def test_version_bumped_after_commit(self):
+        """Версия, видимая до коммита, после коммита уже не действует."""
+        with transaction.atomic():
+            Post.objects.create(text='Новый пост', author=self.user)
+            version = content_version()
+        self.assertNotEqual(content_version(), version)
+
+    def test_login_does_not_invalidate_cache(self):
+        """Обновление last_login не сбрасывает кэш лент."""
+        self.user.set_password('pass')
+        self.user.save(update_fields=['password'])
+        version = content_version()
+        self.authorized_client.login(username='HasNoName', password='pass')
+        self.assertEqual(version, content_version())
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create(username='HasNoName')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cats',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            text='Тестовый пост',
+            author=self.user,
+            group=self.group,
+        )
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.user}
+        )
+
+    def test_card_is_cached_until_post_changes(self):
+        """Карточка поста берётся из кэша, пока пост не изменился."""
+        self.guest_client.get(self.profile_url)
+        Post.objects.update(text='Изменено в обход сигналов')
+        response = self.guest_client.get(self.profile_url)
+        self.assertContains(response, 'Тестовый пост')
+
+        self.post.text = 'Отредактированный пост'
+        self.post.save()
+        response = self.guest_client.get(self.profile_url)
+        self.assertContains(response, 'Отредактированный пост')
+
+    def test_card_is_refreshed_on_group_change(self):
+        """Смена slug группы обновляет карточки её постов."""
+        self.guest_client.get(reverse('posts:index'))
+        self.group.slug = 'dogs'
+        self.group.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:group_list', kwargs={'slug': 'dogs'})
+        )
+
+
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.user = User.objects.create(username='HasNoName')
+        self.authorized_client.force_login(self.user)
+        self.post = Post.objects.create(text='Тестовый пост', author=self.user)
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_anonymous_page_has_validators(self):
+        """Анонимная страница отдаётся с ETag и Last-Modified."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_not_modified(self):
+        """Повторный запрос с If-None-Match получает 304."""
+        response = self.guest_client.get(self.detail_url)
+        not_modified = self.guest_client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_page_cached_until_comment_added(self):
+        """Страница берётся из кэша, пока не добавлен комментарий."""
+        response = self.guest_client.get(self.detail_url)
+        Post.objects.update(text='Изменено в обход сигналов')
+        cached = self.guest_client.get(self.detail_url)
+        self.assertEqual(response.content, cached.content)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий'
+        )
+        fresh = self.guest_client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(fresh.status_code, HTTPStatus.OK)
+        self.assertContains(fresh, 'Новый комментарий')
+
+    def test_stale_page_served_while_rebuilding(self):
+        """Пока страницу пересобирает другой запрос, отдаётся прежняя."""
+        response = self.guest_client.get(self.detail_url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий'
+        )
+        path = hashlib.md5(self.detail_url.encode()).hexdigest()
+        cache.add(f'page:{path}:lock', True)
+        stale = self.guest_client.get(self.detail_url)
+        self.assertEqual(stale.content, response.content)
+        self.assertEqual(stale['ETag'], response['ETag'])
+        cache.delete(f'page:{path}:lock')
+        fresh = self.guest_client.get(self.detail_url)
+        self.assertContains(fresh, 'Новый комментарий')
+
+    def test_page_with_stale_fragment_not_cached(self):
+        """Страница с устаревшим фрагментом не кэшируется и без ETag."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        new_post = Post.objects.create(text='Новый пост', author=self.user)
+        lock = make_template_fragment_key('index_page', ['']) + ':lock'
+        cache.add(lock, True)
+        stale = self.guest_client.get(url)
+        self.assertNotContains(stale, new_post.text)
+        self.assertNotIn('ETag', stale)
+        cache.delete(lock)
+        self.assertContains(self.guest_client.get(url), new_post.text)
+
+    def test_authorized_page_not_cached(self):
+        """Страницы авторизованного пользователя не кэшируются целиком."""
+        response = self.authorized_client.get(self.detail_url)
+        self.assertNotIn('ETag', response)
 
 
 class PostFollowTest(TestCase):
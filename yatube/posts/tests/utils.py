@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+ROW_COUNTS = (10, 100, 1000)
+
+
+class QueryBudgetTestCase(TestCase):
+    """Проверяет, что страница укладывается в лимит SQL-запросов.
+
+    Подкласс заполняет базу через fill(rows) и вызывает assertQueryBudget
+    для каждого размера из ROW_COUNTS: лимит один и тот же, поэтому
+    запрос на каждую строку (N+1) роняет тест на больших объёмах.
+    """
+    row_counts = ROW_COUNTS
+
+    def assertQueryBudget(self, client, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context),
+            budget,
+            f'{url}: {len(context)} запросов при лимите {budget}\n{queries}',
+        )
+        return response
+
+    def assertBudgetForRowCounts(self, fill, client, url, budget):
+        for rows in self.row_counts:
+            with self.subTest(rows=rows):
+                fill(rows)
+                self.assertQueryBudget(client, url, budget)
@@ -0,0 +1,255 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import shards
+from .models import Follow, Post, Timeline, TimelineEntry, UserStats
+from .streams import DEFAULT_ORDERING, MergedFeed
+
+BATCH_SIZE = 500
+
+
+def is_pulled(author_id):
+    """Посты популярного автора подмешиваются в ленты при чтении."""
+    return UserStats.objects.filter(user_id=author_id, pulled=True).exists()
+
+
+def pull_author(author_id):
+    """Перестаёт раскладывать посты автора, набравшего подписчиков."""
+    UserStats.objects.filter(user_id=author_id, pulled=False).update(
+        pulled=True
+    )
+
+
+ENTRY_FIELDS = ('pk', 'author_id', 'pub_date')
+
+
+def _entry_field(lookup):
+    """Поле поста в lookup или ordering → поле записи ленты."""
+    sign = '-' if lookup.startswith('-') else ''
+    name, separator, rest = lookup.lstrip('-').partition('__')
+    if name in ('pk', 'id'):
+        name = 'post_id'
+    return f'{sign}{name}{separator}{rest}'
+
+
+def _entry_q(q):
+    children = [
+        _entry_q(child) if isinstance(child, Q)
+        else (_entry_field(child[0]), child[1])
+        for child in q.children
+    ]
+    return Q(*children, _connector=q.connector, _negated=q.negated)
+
+
+class TimelineFeed:
+    """Материализованная лента читателя, которая ведёт себя как QuerySet.
+
+    filter, order_by, count и срезы выполняются над записями ленты
+    по индексу (user, pub_date, post). Посты страницы читаются тем же
+    запросом по id из подзапроса к ленте и упорядочиваются в Python.
+    """
+    ordered = True
+
+    def __init__(self, entries, posts, ordering=DEFAULT_ORDERING):
+        self.ordering = tuple(ordering)
+        self.entries = entries.order_by(*map(_entry_field, self.ordering))
+        self.posts = posts
+
+    @property
+    def query(self):
+        return self.entries.query
+
+    def filter(self, *args, **kwargs):
+        entries = self.entries.filter(_entry_q(Q(*args, **kwargs)))
+        return TimelineFeed(entries, self.posts, self.ordering)
+
+    def exclude(self, *args, **kwargs):
+        entries = self.entries.exclude(_entry_q(Q(*args, **kwargs)))
+        return TimelineFeed(entries, self.posts, self.ordering)
+
+    def order_by(self, *ordering):
+        return TimelineFeed(self.entries, self.posts, ordering)
+
+    def count(self):
+        return self.entries.count()
+
+    def __len__(self):
+        return self.count()
+
+    def _key(self, post):
+        return tuple(
+            getattr(post, field.lstrip('-')) for field in self.ordering
+        )
+
+    def _fetch(self, entries):
+        posts = self.posts.order_by().filter(
+            pk__in=entries.values('post_id')
+        )
+        return sorted(
+            posts,
+            key=self._key,
+            reverse=self.ordering[0].startswith('-'),
+        )
+
+    def __iter__(self):
+        return iter(self._fetch(self.entries))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None:
+                raise ValueError('TimelineFeed не поддерживает шаг среза.')
+            return self._fetch(self.entries[index])
+        return self[index:index + 1][0]
+
+
+def _add_entries(user_id, posts):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if shards.enabled() or is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту читателя посты автора, на которого он подписался.
+
+    Если других подписок у читателя нет, лента с этого момента полная
+    и её можно отдавать без fallback на join.
+    """
+    if shards.enabled():
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        *ENTRY_FIELDS
+    )
+    with transaction.atomic():
+        if not is_pulled(author_id):
+            _add_entries(user_id, posts.iterator())
+        has_other_follows = Follow.objects.filter(user_id=user_id).exclude(
+            author_id=author_id
+        ).exists()
+        if not has_other_follows:
+            Timeline.objects.update_or_create(
+                user_id=user_id, defaults={'ready': True}
+            )
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def push_author(author_id):
+    """Раскладывает все посты автора, переставшего быть популярным."""
+    if shards.enabled():
+        return
+    UserStats.objects.filter(user_id=author_id).update(pulled=False)
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        *ENTRY_FIELDS
+    )
+    for user_id in followers.iterator():
+        _add_entries(user_id, posts.iterator())
+
+
+def push_fallen_authors():
+    """Раскладывает посты авторов, у которых подписчиков стало меньше порога.
+
+    Отписка такого автора не раскладывает посты сама: у него тысячи
+    подписчиков, и это не работа для запроса. До запуска этой функции
+    его посты по-прежнему подмешиваются при чтении. Возвращает число
+    разложенных авторов.
+    """
+    fallen = UserStats.objects.filter(
+        pulled=True,
+        followers_count__lt=settings.FEED_PULL_THRESHOLD,
+    ).values_list('user_id', flat=True)
+    pushed = 0
+    for author_id in fallen.iterator():
+        with transaction.atomic():
+            push_author(author_id)
+        pushed += 1
+    return pushed
+
+
+def rebuild(user_id):
+    """Заполняет ленту читателя заново по текущим подпискам."""
+    if shards.enabled():
+        return
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(author__stats__pulled=True).values_list(*ENTRY_FIELDS)
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        _add_entries(user_id, posts.iterator())
+        Timeline.objects.update_or_create(
+            user_id=user_id, defaults={'ready': True}
+        )
+
+
+def feed_for(user):
+    """Посты ленты подписок: из материализованной ленты, если она готова.
+
+    Готовая лента листается по записям ленты в порядке pub_date поста,
+    без JOIN с постами и сортировки.
+
+    Посты популярных авторов в ленту не раскладываются: каждый такой автор
+    даёт отдельный отсортированный поток, который сливается с лентой.
+    При шардировании лента не материализуется и собирается из шардов.
+    """
+    posts = shards.with_related(Post.objects.all(), 'author', 'group')
+    if shards.enabled():
+        authors = Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        )
+        return shards.scatter(posts.filter(author_id__in=list(authors)))
+    if not Timeline.objects.filter(user=user, ready=True).exists():
+        return posts.filter(author__following__user=user)
+    pulled = list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__pulled=True,
+        ).values_list('author_id', flat=True)
+    )
+    pushed = TimelineFeed(TimelineEntry.objects.filter(user=user), posts)
+    if not pulled:
+        return pushed
+    streams = [pushed.exclude(author_id__in=pulled)]
+    streams.extend(
+        posts.filter(author_id=author_id) for author_id in pulled
+    )
+    return MergedFeed(streams)
@@ -1,35 +1,61 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.http import urlencode
 
+from core.db import retry_on_lock
+
+from . import autocomplete as prefix_index
+from . import shards
+from .caching import cache_anonymous_page, content_version
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Comment, Follow
+from .models import ArchivedPost, Post, Group, User, Follow
+from .paginators import CURSOR_PARAMS, CachedCountPaginator, CursorPaginator
+from .search import SearchPaginator
+from .streams import MergedFeed
+from .timeline import feed_for
 
 
 VARIABLE_NUM_POSTS = 10
 
 
 def general_paginator(request, post_list):
-    paginator = Paginator(post_list, VARIABLE_NUM_POSTS)
+    if settings.KEYSET_PAGINATION or any(
+        param in request.GET for param in CURSOR_PARAMS
+    ):
+        paginator = CursorPaginator(post_list, VARIABLE_NUM_POSTS)
+        return paginator.get_cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    paginator = CachedCountPaginator(post_list, VARIABLE_NUM_POSTS)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+@cache_anonymous_page
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
+    post_list = shards.scatter(
+        shards.with_related(Post.objects.all(), 'author', 'group')
+    )
     page_obj = general_paginator(request, post_list)
     context = {
         'page_obj': page_obj,
+        'content_version': content_version(),
     }
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = shards.scatter(
+        shards.with_related(group.posts.all(), 'author', 'group')
+    )
     page_obj = general_paginator(request, post_list)
     context = {
         'group': group,
@@ -38,10 +64,19 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = shards.with_related(author.posts.all(), 'author', 'group')
+    stats = getattr(author, 'stats', None)
+    if stats and stats.archived_count:
+        post_list = MergedFeed([
+            post_list,
+            author.archived_posts.select_related('author', 'group'),
+        ])
     page_obj = general_paginator(request, post_list)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author
@@ -54,20 +89,56 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@cache_anonymous_page
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, VARIABLE_NUM_POSTS)
+        page_obj = paginator.get_cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+def autocomplete(request):
+    results = prefix_index.index.lookup(request.GET.get('q', ''))
+    return JsonResponse({'results': results})
+
+
+@cache_anonymous_page
 def post_detail(request, post_id,):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    posts = shards.with_related(Post.objects.all(), 'author__stats', 'group')
+    archived = False
+    try:
+        post = shards.by_pk(posts, post_id).get(pk=post_id)
+    except Post.DoesNotExist:
+        archived = True
+        post = get_object_or_404(
+            ArchivedPost.objects.select_related('author__stats', 'group'),
+            pk=post_id,
+        )
     form = CommentForm()
-    comments = Comment.objects.filter(post=post)
+    comments = shards.with_related(post.comments.all(), 'author')
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'archived': archived,
     }
     return render(request, template, context)
 
 
 @login_required
+@retry_on_lock
 def post_create(request):
     template = 'posts/post_create.html'
     form = PostForm(
@@ -86,10 +157,13 @@ def post_create(request):
 
 
 @login_required
+@retry_on_lock
 def post_edit(request, post_id):
     template = 'posts/post_create.html'
     is_edit = True
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        shards.by_pk(Post.objects.all(), post_id), pk=post_id
+    )
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
@@ -108,8 +182,11 @@ def post_edit(request, post_id):
 
 
 @login_required
+@retry_on_lock
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        shards.by_pk(Post.objects.all(), post_id), pk=post_id
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -123,7 +200,7 @@ def add_comment(request, post_id):
 def follow_index(request):
     template = 'posts/follow.html'
     follower = request.user
-    post_list = Post.objects.filter(author__following__user=follower)
+    post_list = feed_for(follower)
     page_obj = general_paginator(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -132,6 +209,7 @@ def follow_index(request):
 
 
 @login_required
+@retry_on_lock
 def profile_follow(request, username):
     follower = request.user
     author = get_object_or_404(User, username=username)
@@ -146,6 +224,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@retry_on_lock
 def profile_unfollow(request, username):
     follower = request.user
     author = get_object_or_404(User, username=username)
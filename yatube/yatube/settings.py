@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from PIL import features
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -50,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,9 +92,51 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Прагмы для каждого нового соединения SQLite. В WAL чтение не ждёт
+# записи, busy_timeout (мс) ждёт чужую блокировку вместо ошибки,
+# mmap_size и cache_size (КиБ при отрицательном значении) держат горячие
+# страницы в памяти процесса.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+# Сколько раз повторять транзакцию, получившую database is locked.
+SQLITE_LOCK_RETRIES = 5
+
+# Алиасы из DATABASES с копиями основной базы только для чтения, например
+# 'replica': {'ENGINE': ..., 'NAME': 'replica.sqlite3',
+#             'TEST': {'MIRROR': 'default'}}.
+# GET-запросы читают со случайной реплики, запись идёт в default. Клиент,
+# который писал, REPLICA_LAG секунд читает основную базу.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = [
+    'posts.shards.ShardRouter',
+    'core.replicas.ReplicaRouter',
+]
+REPLICA_LAG = 10
+
+# Алиасы из DATABASES для шардов постов, порядок менять нельзя: индекс
+# шарда хранится в id постов и комментариев. Пусто — всё в default.
+# Посты лежат в шарде по хэшу author_id, комментарии — рядом с постом;
+# пользователи, группы, подписки и индекс поиска остаются в default.
+# Посты, уже созданные в default, при включении шардов не видны:
+# до включения перенесите их командой shard_posts с тем же списком
+# алиасов. Перенесённые посты получают новые id.
+POST_SHARDS = []
+
+# Посты старше стольких дней archive_posts переносит вместе
+# с комментариями в архивные таблицы: главная и ленты читают только
+# свежие посты, страница поста и профиль находят и архивные.
+ARCHIVE_AFTER_DAYS = 365
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -149,9 +194,73 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Загрузки хранятся по хэшу содержимого, миниатюры sorl — по своим именам.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Keyset-пагинация лент по (pub_date, id) вместо номеров страниц.
+# Ссылки вида ?after=/?before= обрабатываются и при выключенной настройке.
+KEYSET_PAGINATION = False
+
+# Авторы с таким числом подписчиков не раскладывают посты по лентам
+# подписчиков: их посты подмешиваются в ленту при чтении. Автор,
+# опустившийся ниже порога, снова раскладывает посты только после
+# backfill_timelines, а не в запросе отписки.
+FEED_PULL_THRESHOLD = 10000
+
+# Сколько секунд пагинатор может показывать устаревшее число постов.
+PAGINATOR_COUNT_TIMEOUT = 60
+
+# Сколько секунд хранить готовые страницы для анонимных пользователей.
+# Любое изменение контента меняет ключ раньше этого срока.
+PAGE_CACHE_TIMEOUT = 600
+
+# True — общий для всех воркеров хоста кэш в файле SQLite (WAL, LRU),
+# False — отдельный LocMemCache в памяти каждого процесса. При нескольких
+# процессах нужен True: через кэш процессы узнают об изменениях контента
+# и подсказок автодополнения.
+SHARED_CACHE = False
+
+# Миниатюры создаются фоновым воркером при загрузке картинки;
+# шаблоны выводят только готовые миниатюры этих размеров. False —
+# миниатюры создаются сразу в запросе; тесты с временным MEDIA_ROOT
+# выключают воркер через override_settings.
+THUMBNAIL_ASYNC = True
+# Карточки постов выводятся с srcset из нескольких ширин с пропорциями
+# 960x339; WebP добавляется, если Pillow собран с его поддержкой.
+THUMBNAIL_WIDTHS = (480, 960, 1440)
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+THUMBNAIL_PRESETS = tuple(
+    (
+        f'{width}x{round(width * 339 / 960)}',
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for width in THUMBNAIL_WIDTHS
+    for image_format in THUMBNAIL_FORMATS
+)
+# Сколько готовых миниатюр держать в памяти процесса.
+THUMBNAIL_LRU_SIZE = 4096
+# Промахи по миниатюрам не кэшируются в кэше sorl: их создаёт другой
+# процесс. Процесс помнит промах из prefetch только на время рендера.
+THUMBNAIL_KVSTORE = 'core.thumbnails.ReadyKVStore'
+THUMBNAIL_MISS_TIMEOUT = 2
+# Загруженные картинки поворачиваются по EXIF, очищаются от метаданных
+# и уменьшаются до этого размера по большей стороне.
+IMAGE_MAX_SIZE = 2048
+
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}